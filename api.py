@@ -1,13 +1,17 @@
 from supabase import create_client, Client
-import requests
-from bs4 import BeautifulSoup
-import os
-from datetime import datetime
 import re
 import random
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from fetching import ImageDownloader, PageFetcher, make_chrome_driver
+from image_pack import ImagePack
+from image_store import ImageStore
+from image_transcode import ImageTranscoder
+from ndjson_sink import NdjsonSink
+from parsing import ProductGridParser
+from response_cache import ResponseCache
+from supabase_sync import ProductSink, StorageManifest
 
 
 class SupabaseHandler:
@@ -16,6 +20,7 @@ class SupabaseHandler:
     def __init__(self, url: str, key: str):
         self.supabase: Client = create_client(url, key)
         self.storage_bucket = 'productimages'
+        self.manifest = StorageManifest(self.supabase, self.storage_bucket)
 
     def insert_product(self, product_data: dict):
         """Inserts product data into the Supabase 'products' table."""
@@ -25,20 +30,26 @@ class SupabaseHandler:
         except Exception as e:
             print(f"Failed to insert {product_data.get('name')} into Supabase:", e)
 
-    def upload_image(self, image_path: str, filename: str):
-        """Uploads image to Supabase storage if not exists already."""
+    def product_sink(self, on_conflict: str = 'product_link', batch_size: int = 200):
+        """Returns a buffered sink that bulk-upserts products keyed on on_conflict."""
+        return ProductSink(self.supabase, batch_size=batch_size, on_conflict=on_conflict)
+
+    def upload_image(self, image_path: str, filename: str, content_type: str = 'image/jpeg', data: bytes = None):
+        """Uploads image to Supabase storage if not exists already, from image_path or from `data`."""
         try:
-            existing_files = self.supabase.storage.from_(self.storage_bucket).list()
-            if any(f['name'] == filename for f in existing_files):
+            if filename in self.manifest:
                 print(f"Image already exists: {filename}, skipping upload.")
                 return filename
 
-            with open(image_path, 'rb') as f:
-                self.supabase.storage.from_(self.storage_bucket).upload(
-                    path=filename,
-                    file=f,
-                    file_options={"content-type": "image/jpeg"}
-                )
+            if data is None:
+                with open(image_path, 'rb') as f:
+                    data = f.read()
+            self.supabase.storage.from_(self.storage_bucket).upload(
+                path=filename,
+                file=data,
+                file_options={"content-type": content_type}
+            )
+            self.manifest.add(filename)
             return filename
         except Exception as e:
             print(f"Error uploading {filename} to Supabase:", e)
@@ -46,41 +57,77 @@ class SupabaseHandler:
 
 
 class ImageHandler:
-    """Handles downloading and saving product images."""
+    """Handles downloading and saving product images.
+
+    Images are stored by content hash (see ImageStore), so an image seen in an
+    earlier scrape is neither written nor downloaded again. They are packed
+    into one archive (see ImagePack) rather than kept as loose files. Each
+    stored image also gets thumbnail and WebP variants (see ImageTranscoder);
+    the WebP one is what gets uploaded.
+    """
 
-    def __init__(self, image_dir: str = 'scarp_images'):
+    def __init__(self, image_dir: str = 'scarp_images', downloader: ImageDownloader = None,
+                 transcoder: ImageTranscoder = None):
         self.image_dir = image_dir
-        os.makedirs(self.image_dir, exist_ok=True)
+        self.downloader = downloader or ImageDownloader()
+        self.transcoder = transcoder or ImageTranscoder()
+        self.pack = ImagePack(self.image_dir)
+        self.store = ImageStore(self.image_dir, pack=self.pack)
 
     def download_image(self, image_url: str, product_name: str, supabase: SupabaseHandler):
-        """Downloads an image from a URL and saves it locally."""
+        """Downloads an image from a URL (if it changed) and returns its local filename."""
         if not image_url:
             print(f"No image URL for {product_name}")
             return None
 
-        try:
-            response = requests.get(image_url)
-            response.raise_for_status()
-        except requests.RequestException:
+        filename = self.store.fetch(image_url, self.downloader)
+        if filename is None:
             print(f"Failed to download image for {product_name}")
             return None
 
-        filename = self.save_image_locally(response.content, product_name)
-        # uploaded_filename = supabase.upload_image(os.path.join(self.image_dir, filename), filename)
+        variants = self.transcoder.transcode_packed(self.pack, filename)
+        if variants is None:
+            print(f"Failed to transcode image for {product_name}")
+        # uploaded_filename = supabase.upload_image(None, os.path.basename(variants["webp"]), 'image/webp',
+        #                                           data=self.pack.get(variants["webp"]))
         return filename
 
+    def queue_image(self, image_url: str, product_name: str, supabase: SupabaseHandler):
+        """Queues a background download; the returned Future resolves to the saved filename or None."""
+        if not image_url:
+            print(f"No image URL for {product_name}")
+            return None
+        return self.downloader.run(self.download_image, image_url, product_name, supabase)
+
+    def close(self):
+        """Waits for queued downloads to finish and persists the URL index."""
+        self.downloader.close()
+        self.transcoder.close()
+        self.store.save_index()
+        self.pack.close()
+
     def save_image_locally(self, image_content: bytes, product_name: str):
-        """Saves image content to a local file with a unique filename."""
-        safe_name = re.sub(r'[\\/*?:"<>|]', "", product_name)
-        filename = f"{safe_name}_{datetime.now().strftime('%Y%m%d')}_{random.randint(1000,9999)}.jpg"
-        path = os.path.join(self.image_dir, filename)
-        with open(path, 'wb') as f:
-            f.write(image_content)
-        return filename
+        """Saves image content under its content hash and returns the filename."""
+        return self.store.put(image_content)
+
+
+@dataclass(slots=True)
+class ProductRecord:
+    """One scraped product, as written to the NDJSON output."""
+    name: str
+    amount: float
+    type: str
+    category: str
+    brand: str
+    rating: float
+    reviews_count: int
+    description: str
+    banner_url: str = None
+    product_link: str = None
 
 
 class FlipkartScraper:
-    """Scrapes product data from Flipkart and inserts it into Supabase."""
+    """Scrapes product data from Flipkart and streams it to an NDJSON file."""
 
     BASE_URL = "https://www.flipkart.com/search?q={}&otracker=search"
 
@@ -90,71 +137,107 @@ class FlipkartScraper:
 
     LINK_CLASSES = ["CGtC98", "IRpwTa", "s1Q9rs"]
 
-    def __init__(self, product_names: list, supabase_handler: SupabaseHandler):
+    def __init__(self, product_names: list, supabase_handler: SupabaseHandler, max_workers: int = 3,
+                 cache: ResponseCache = None, output: str = 'products.ndjson', max_pending_images: int = 64):
         self.product_names = product_names
         self.supabase = supabase_handler
         self.image_handler = ImageHandler()
-        self.driver = self._setup_selenium()
-        self.data = []
-        self.total = []
+        self.max_workers = max_workers
+        self.fetcher = PageFetcher(self._setup_selenium, drivers=max_workers, cache=cache or ResponseCache(),
+                                   wait_selector=", ".join("div." + c.replace(" ", ".") for c in self.PRODUCT_CLASSES))
+        self.parser = ProductGridParser(self.PRODUCT_CLASSES, self.PRICE_CLASSES, self.LINK_CLASSES)
+        self.output = output
+        self.max_pending_images = max_pending_images
 
     def _setup_selenium(self):
-        options = Options()
-        options.add_argument("--headless")
-        return webdriver.Chrome(options=options)
+        return make_chrome_driver()
 
     def scrape_all_products(self):
-        for product in self.product_names:
-            print(f"Scraping: {product}")
-            self.total.extend(self.scrape_product_page(self.BASE_URL.format(product.replace(" ", "%20"))))
-            print(f"Finished scraping: {product}\n")
-        print(json.dumps(self.total, indent=4))
-
-    def scrape_product_page(self, url: str):
-        self.driver.get(url)
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-        containers = soup.find_all('div', class_=self.PRODUCT_CLASSES)
+        """Streams every product to the NDJSON output as soon as its image is saved.
+
+        Up to max_workers search pages are fetched at once and parsed in input
+        order. A record is held only until its image download finishes
+        (records without an image are written right away), and parsing pauses
+        while max_pending_images downloads are in flight, so memory stays
+        bounded however many products there are. Lines therefore come out in
+        download completion order, not parse order.
+        """
+        pending_images = threading.BoundedSemaphore(self.max_pending_images)
+        with NdjsonSink(self.output) as sink:
+            for record, image_future in self.iter_products():
+                if image_future:
+                    pending_images.acquire()
+                    image_future.add_done_callback(
+                        lambda f, record=record: self._write_record(sink, record, f, pending_images)
+                    )
+                else:
+                    sink.write(record)
+            # Closing the handler waits for the remaining downloads and so for their records.
+            self.image_handler.close()
+        print(f"Wrote {sink.written} products to {self.output}")
+
+    def _write_record(self, sink: NdjsonSink, record: ProductRecord, image_future, pending_images):
+        try:
+            record.banner_url = None if image_future.exception() else image_future.result()
+            sink.write(record)
+        finally:
+            pending_images.release()
+
+    def iter_products(self):
+        """Yields (ProductRecord, image Future or None) for every product of every search term."""
+        urls = [self.BASE_URL.format(product.replace(" ", "%20")) for product in self.product_names]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pages = executor.map(self._fetch_containers, urls)
+            for product, url, containers in zip(self.product_names, urls, pages):
+                print(f"Scraping: {product}")
+                yield from self.scrape_product_page(url, containers)
+                print(f"Finished scraping: {product}\n")
+        self.fetcher.close()
+
+    def _fetch_containers(self, url: str):
+        return self.fetcher.fetch(url, self.parser.parse)
+
+    def scrape_product_page(self, url: str, containers=None):
+        if containers is None:
+            containers = self._fetch_containers(url)
 
         if not containers:
             print(f"No products found for URL: {url}")
             return
 
         for container in containers:
-            self.scrape_product(container)
+            yield self.scrape_product(container)
 
-        return self.data
+    def scrape_product(self, container: dict):
+        """Builds a product record from the fields ProductGridParser extracted for one container.
 
-    def scrape_product(self, container):
-        image_tag = container.find('img')
-        image_url = image_tag.get('src') or image_tag.get('data-src') if image_tag else None
-        product_name = image_tag.get('alt', 'Unnamed Product') if image_tag else 'Unnamed Product'
-        price = self._extract_price(container)
+        Returns the record and the Future of its queued image download, whose
+        result is the banner_url.
+        """
+        image_url = container['image_url']
+        product_name = container['name'] or 'Unnamed Product'
+        price = container['price']
         link = self._extract_link(container)
-        image_filename = self.image_handler.download_image(image_url, product_name, self.supabase)
-
-        return self.data.append({
-            "name": product_name,
-            "amount": self._clean_price(price),
-            "type": "Watch",
-            "category": "Watch",
-            "brand": "Google",
-            "rating": round(random.uniform(3.0, 5.0), 1),
-            "reviews_count": random.randint(50, 5000),
-            "description": product_name,
-            "banner_url": image_filename,
-            "product_link": link
-        })
-
-        # self.supabase.insert_product(product_data)
-
-    def _extract_price(self, container):
-        price_tag = container.find('div', class_=self.PRICE_CLASSES)
-        return price_tag.text.strip() if price_tag else None
+
+        record = ProductRecord(
+            name=product_name,
+            amount=self._clean_price(price),
+            type="Watch",
+            category="Watch",
+            brand="Google",
+            rating=round(random.uniform(3.0, 5.0), 1),
+            reviews_count=random.randint(50, 5000),
+            description=product_name,
+            product_link=link
+        )
+        image_future = self.image_handler.queue_image(image_url, product_name, self.supabase)
+        return record, image_future
+
+        # self.supabase.insert_product(dataclasses.asdict(record))
 
     def _extract_link(self, container):
-        link_tag = container.find('a', class_=self.LINK_CLASSES)
-        if link_tag and 'href' in link_tag.attrs:
-            return "https://www.flipkart.com" + link_tag['href']
+        if container['href']:
+            return "https://www.flipkart.com" + container['href']
         return None
 
     def _clean_price(self, price_str):
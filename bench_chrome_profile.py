@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from api import FlipkartScraper
+from fetching import DriverPool, chrome_options, make_chrome_driver
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "flipkart_search.html")
+WAIT_SELECTOR = ", ".join("div." + c.replace(" ", ".") for c in FlipkartScraper.PRODUCT_CLASSES)
+
+# Sizes of the stand-in subresources served in --local mode.
+ASSET_SIZES = {".jpeg": 40 * 1024, ".woff2": 100 * 1024, ".css": 2 * 1024, ".mp4": 1024 * 1024}
+EXTRA_HEAD = (
+    '<link rel="stylesheet" href="/static/fonts.css">'
+    '<video autoplay muted src="/static/promo.mp4"></video>'
+)
+FONTS_CSS = (
+    "@font-face { font-family: Inter; src: url(/static/inter.woff2) format('woff2'); }\n"
+    "body { font-family: Inter, sans-serif; }\n"
+)
+
+
+class LocalSearchHandler(BaseHTTPRequestHandler):
+    """Serves the saved search page with its images, plus a web font and a video, from localhost."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/search":
+            body, content_type = self.server.page, "text/html; charset=utf-8"
+        elif path == "/static/fonts.css":
+            body, content_type = FONTS_CSS.encode(), "text/css"
+        else:
+            extension = os.path.splitext(path)[1]
+            body, content_type = b"\0" * ASSET_SIZES.get(extension, 1024), "application/octet-stream"
+            time.sleep(self.server.asset_latency)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_local_site(asset_latency):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LocalSearchHandler)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    with open(FIXTURE, encoding="utf-8") as f:
+        html = f.read()
+    html = html.replace("https://rukminim2.flixcart.com", base).replace("<head>", "<head>" + EXTRA_HEAD, 1)
+    server.page = html.encode("utf-8")
+    server.asset_latency = asset_latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, base + "/search?q={}"
+
+
+def with_performance_log(options):
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+def default_driver():
+    """The driver setup the scrapers used before: plain headless Chrome with normal page loads."""
+    options = Options()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=with_performance_log(options))
+    driver.execute_cdp_cmd("Network.enable", {})
+    return driver
+
+
+def tuned_driver():
+    return make_chrome_driver(with_performance_log(chrome_options()))
+
+
+def transferred(driver):
+    """(bytes received, requests finished, requests blocked) since the log was last read."""
+    received = finished = blocked = 0
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        if message["method"] == "Network.loadingFinished":
+            received += message["params"].get("encodedDataLength", 0)
+            finished += 1
+        elif message["method"] == "Network.loadingFailed" and message["params"].get("blockedReason"):
+            blocked += 1
+    return received, finished, blocked
+
+
+def bench_profile(name, factory, urls, wait_selector):
+    driver = factory()
+    # Every search is measured cold, as it is for the first page of each term in a real run.
+    driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+    pool = DriverPool(lambda: driver, size=1, wait_selector=wait_selector)
+    pool.render("about:blank")
+    transferred(driver)
+
+    rows = []
+    for url in urls:
+        start = time.perf_counter()
+        html = pool.render(url)
+        elapsed = time.perf_counter() - start
+        received, finished, blocked = transferred(driver)
+        rows.append((elapsed, received, finished, blocked, len(html)))
+    pool.close()
+
+    print(f"\n{name}")
+    for url, (elapsed, received, finished, blocked, html_size) in zip(urls, rows):
+        print(f"  {elapsed * 1000:>8.0f} ms {received / 1024:>9.0f} KiB {finished:>5} requests "
+              f"{blocked:>4} blocked  {html_size / 1024:>5.0f} KiB DOM  {url[:60]}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare page time and bytes transferred per search for the default and tuned Chrome profiles."
+    )
+    parser.add_argument("terms", nargs="*", default=["iphone 15", "pixel 8", "samsung galaxy s23"])
+    parser.add_argument("--local", action="store_true",
+                        help="serve the saved fixture page (with stand-in images, font and video) from localhost")
+    parser.add_argument("--asset-latency", type=float, default=0.05, help="seconds per subresource in --local mode")
+    args = parser.parse_args()
+
+    template = FlipkartScraper.BASE_URL
+    if args.local:
+        server, template = start_local_site(args.asset_latency)
+    urls = [template.format(term.replace(" ", "%20")) for term in args.terms]
+
+    default_rows = bench_profile("default profile (normal load, everything fetched)", default_driver, urls, None)
+    tuned_rows = bench_profile("tuned profile (eager load, images/fonts/media blocked, explicit wait)",
+                               tuned_driver, urls, WAIT_SELECTOR)
+
+    def totals(rows):
+        return sum(r[0] for r in rows) / len(rows), sum(r[1] for r in rows) / len(rows)
+
+    default_time, default_bytes = totals(default_rows)
+    tuned_time, tuned_bytes = totals(tuned_rows)
+    print(f"\nper search: default {default_time * 1000:.0f} ms / {default_bytes / 1024:.0f} KiB, "
+          f"tuned {tuned_time * 1000:.0f} ms / {tuned_bytes / 1024:.0f} KiB "
+          f"({default_time / tuned_time:.1f}x faster, {default_bytes / max(tuned_bytes, 1):.1f}x fewer bytes)")
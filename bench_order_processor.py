@@ -0,0 +1,168 @@
+import argparse
+import os
+import random
+import threading
+import time
+
+from fake_voxships import FakeVoxShipsServer
+from order import Database, OrderProcessor
+from voxships import SubmissionRejected
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'voxships_schema.sql')
+
+TABLES = ('PurchasedItems', 'Sale', 'ShippingAddress', 'InventoryOwner')
+
+
+def seed_database(db, orders, items_per_order=3, owners=5, seed=42):
+    """Recreates the order tables from fixtures/voxships_schema.sql and fills them with pending sales."""
+    rng = random.Random(seed)
+    connection = db.connect()
+    cursor = connection.cursor()
+    try:
+        for table in TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        with open(SCHEMA_FILE) as f:
+            schema = '\n'.join(line for line in f if not line.startswith('--'))
+        for statement in schema.split(';'):
+            if statement.strip():
+                cursor.execute(statement)
+
+        cursor.executemany("INSERT INTO InventoryOwner (id, apiToken) VALUES (%s, %s)",
+                           [(owner, f'token-{owner}') for owner in range(1, owners + 1)])
+        cursor.executemany(
+            """INSERT INTO ShippingAddress (id, firstName, lastName, address1, address2, city, state, zip, country, phoneNumber)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+            [(sale, 'Test', f'Customer {sale}', f'{sale} Main St', None, 'Springfield', 'IL', '62701', 'US', '555-0100')
+             for sale in range(1, orders + 1)]
+        )
+        cursor.executemany(
+            """INSERT INTO Sale (id, customerId, memberId, badgeId, inventoryOwnerId, shippingAddressId, email, shipMethod)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+            [(sale, 1, 1, 1, rng.randint(1, owners), sale, f'customer{sale}@example.com', 'Ground')
+             for sale in range(1, orders + 1)]
+        )
+        cursor.executemany(
+            "INSERT INTO PurchasedItems (saleId, sku, quantity, name) VALUES (%s, %s, %s, %s)",
+            [(sale, f'SKU-{rng.randint(1, 500)}', rng.randint(1, 4), f'Item {item}')
+             for sale in range(1, orders + 1) for item in range(items_per_order)]
+        )
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+    return list(range(1, orders + 1))
+
+
+def reset_orders(db):
+    db.execute_query("UPDATE Sale SET flag = NULL, apiComment = NULL")
+
+
+class LatencyRecorder:
+    """Wraps OrderProcessor.create_order_api_request to time every API submission.
+
+    Calls the circuit breaker or bulkhead rejected without sending are
+    counted in `rejected` instead of being timed.
+    """
+
+    def __init__(self, processor):
+        self.samples = []
+        self.rejected = 0
+        self.lock = threading.Lock()
+        submit = processor.create_order_api_request
+
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                result = submit(*args)
+            except SubmissionRejected:
+                with self.lock:
+                    self.rejected += 1
+                raise
+            except Exception:
+                self.record(time.perf_counter() - start)
+                raise
+            self.record(time.perf_counter() - start)
+            return result
+
+        processor.create_order_api_request = timed
+
+    def record(self, elapsed):
+        with self.lock:
+            self.samples.append(elapsed)
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+# Each mode returns the number of sales whose status was actually written.
+
+def run_single(processor, sale_ids, args):
+    written = 0
+    for sale_id in sale_ids:
+        # process_order only returns something when it did not write a status.
+        if processor.process_order({'customerId': 1, 'memberId': 1, 'badgeId': 1, 'saleId': sale_id}) is None:
+            written += 1
+    return written
+
+
+def run_batched(processor, sale_ids, args):
+    written = 0
+    for i in range(0, len(sale_ids), args.batch_size):
+        written += len(processor.process_orders(sale_ids[i:i + args.batch_size], max_workers=1))
+    return written
+
+
+def run_concurrent(processor, sale_ids, args):
+    written = 0
+    for i in range(0, len(sale_ids), args.batch_size):
+        written += len(processor.process_orders(sale_ids[i:i + args.batch_size], max_workers=args.concurrency))
+    return written
+
+
+MODES = {
+    'single': run_single,
+    'batched': run_batched,
+    'concurrent': run_concurrent,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure OrderProcessor throughput against a seeded MySQL and a fake API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='root')
+    parser.add_argument('--database', default='vox_bench')
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--items-per-order', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.02, help='fake API seconds per order')
+    parser.add_argument('--latency-jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=None)
+    parser.add_argument('--modes', default=','.join(MODES))
+    args = parser.parse_args()
+
+    db = Database(args.host, args.user, args.password, args.database)
+    print(f'Seeding {args.orders} orders into {args.database}...')
+    sale_ids = seed_database(db, args.orders, args.items_per_order)
+
+    with FakeVoxShipsServer(latency=args.latency, latency_jitter=args.latency_jitter,
+                            error_rate=args.error_rate, rate_limit=args.rate_limit) as server:
+        print(f'{"mode":<12} {"orders/sec":>12} {"p50 ms":>10} {"p99 ms":>10} {"written":>8} {"rejected":>9} '
+              f'{"pending":>8}')
+        for mode in args.modes.split(','):
+            reset_orders(db)
+            processor = OrderProcessor(db, api_url=server.url)
+            recorder = LatencyRecorder(processor)
+            start = time.perf_counter()
+            written = MODES[mode](processor, sale_ids, args)
+            elapsed = time.perf_counter() - start
+            # Only sales with a written status count; rejected or failed submissions stay pending.
+            print(f'{mode:<12} {written / elapsed:>12.1f} {recorder.percentile(50) * 1000:>10.1f} '
+                  f'{recorder.percentile(99) * 1000:>10.1f} {written:>8} {recorder.rejected:>9} '
+                  f'{len(sale_ids) - written:>8}')
+        print(f'fake API stats: {server.stats}')
@@ -0,0 +1,75 @@
+import argparse
+import os
+import time
+
+from bs4 import BeautifulSoup
+
+from api import FlipkartScraper
+from parsing import PARSER, ProductGridParser, parse_html, parse_product_containers
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "flipkart_search.html")
+
+
+def extract(containers):
+    """The fields FlipkartScraper.scrape_product reads from each container."""
+    rows = []
+    for container in containers:
+        image_tag = container.find("img")
+        price_tag = container.find("div", class_=FlipkartScraper.PRICE_CLASSES)
+        link_tag = container.find("a", class_=FlipkartScraper.LINK_CLASSES)
+        rows.append((
+            image_tag.get("alt") if image_tag else None,
+            price_tag.text.strip() if price_tag else None,
+            link_tag.get("href") if link_tag else None,
+        ))
+    return rows
+
+
+def html_parser_full(html):
+    soup = BeautifulSoup(html, "html.parser")
+    return extract(soup.find_all("div", class_=FlipkartScraper.PRODUCT_CLASSES))
+
+
+def lxml_full(html):
+    return extract(parse_html(html).find_all("div", class_=FlipkartScraper.PRODUCT_CLASSES))
+
+
+def lxml_strained(html):
+    return extract(parse_product_containers(html, FlipkartScraper.PRODUCT_CLASSES))
+
+
+GRID_PARSER = ProductGridParser(FlipkartScraper.PRODUCT_CLASSES, FlipkartScraper.PRICE_CLASSES,
+                                FlipkartScraper.LINK_CLASSES)
+
+
+def lxml_xpath(html):
+    return [(p["name"], p["price"], p["href"]) for p in GRID_PARSER.parse(html)]
+
+
+def bench(fn, html, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn(html)
+    return (time.perf_counter() - start) / rounds, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time search-page parsing strategies on a saved HTML fixture.")
+    parser.add_argument("--fixture", default=FIXTURE)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.fixture, encoding="utf-8") as f:
+        html = f.read()
+
+    baseline_time, baseline = bench(html_parser_full, html, args.rounds)
+    print(f"{len(html) / 1024:.0f} KiB page, {len(baseline)} containers, parsing.PARSER={PARSER}")
+    print(f"{'html.parser, full tree':<28} {baseline_time * 1000:>8.1f} ms")
+    for name, fn in (
+        (f"{PARSER}, full tree", lxml_full),
+        (f"{PARSER} + SoupStrainer", lxml_strained),
+        ("lxml + compiled XPath", lxml_xpath),
+    ):
+        elapsed, rows = bench(fn, html, args.rounds)
+        same = "same fields" if rows == baseline else "FIELDS DIFFER"
+        print(f"{name:<28} {elapsed * 1000:>8.1f} ms  {baseline_time / elapsed:>5.1f}x  {same}")
@@ -0,0 +1,79 @@
+import argparse
+import random
+import time
+
+from supabase_sync import StorageManifest
+
+
+class FakeBucket:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def list(self, path=None, options=None):
+        options = options or {}
+        offset = options.get("offset", 0)
+        limit = options.get("limit", 100)
+        self.storage.list_calls += 1
+        if self.storage.latency:
+            time.sleep(self.storage.latency)
+        return self.storage.objects[offset:offset + limit]
+
+
+class FakeStorage:
+    """In-memory stand-in for supabase.storage with a fixed per-request latency."""
+
+    def __init__(self, objects, latency):
+        self.objects = [{"name": name} for name in objects]
+        self.latency = latency
+        self.list_calls = 0
+
+    def from_(self, bucket):
+        return FakeBucket(self)
+
+
+class FakeSupabase:
+    def __init__(self, objects, latency):
+        self.storage = FakeStorage(objects, latency)
+
+
+def full_listing_exists(supabase, filename, page_size):
+    """The old upload_image check: list the whole bucket and scan it."""
+    offset = 0
+    while True:
+        page = supabase.storage.from_("productimages").list(options={"limit": page_size, "offset": offset})
+        if any(f["name"] == filename for f in page):
+            return True
+        if len(page) < page_size:
+            return False
+        offset += page_size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-upload bucket listing against StorageManifest lookups.")
+    parser.add_argument("--objects", type=int, default=10000)
+    parser.add_argument("--checks", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated seconds per list request")
+    args = parser.parse_args()
+
+    names = [f"product_{i}.jpg" for i in range(args.objects)]
+    probes = [random.choice(names) if i % 2 else f"new_{i}.jpg" for i in range(args.checks)]
+
+    supabase = FakeSupabase(names, args.latency)
+    start = time.perf_counter()
+    for name in probes:
+        full_listing_exists(supabase, name, args.page_size)
+    listing_time = time.perf_counter() - start
+    listing_calls = supabase.storage.list_calls
+
+    supabase = FakeSupabase(names, args.latency)
+    manifest = StorageManifest(supabase, "productimages", page_size=args.page_size)
+    start = time.perf_counter()
+    for name in probes:
+        if name not in manifest:
+            manifest.add(name)
+    manifest_time = time.perf_counter() - start
+
+    print(f"{args.objects} objects, {args.checks} existence checks, {args.latency * 1000:.1f} ms per list request")
+    print(f"{'full listing':<16} {listing_time:>9.3f}s {listing_calls:>8} list requests")
+    print(f"{'StorageManifest':<16} {manifest_time:>9.3f}s {supabase.storage.list_calls:>8} list requests")
@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import time
+
+import requests
+
+from fake_voxships import FakeVoxShipsServer
+from voxships import AsyncVoxShipsClient, VoxShipsClient
+
+
+def payload(number):
+    return {
+        'orderNumber': number,
+        'shipMethod': 'Ground',
+        'orderDate': '2024-01-01 00:00:00',
+        'productItems': [{'itemSkuNumber': 'SKU-1', 'itemQty': 1, 'itemName': 'Item'}],
+        'orderShippingAddress': {'firstName': 'Test', 'lastName': 'User'},
+    }
+
+
+def bench_requests_post(url, count):
+    for number in range(count):
+        requests.post(f'{url}/orders/createOrder', json=payload(number), headers={'apiToken': 'bench'}, verify=False).json()
+
+
+def bench_session_client(url, count):
+    with VoxShipsClient(url) as client:
+        for number in range(count):
+            client.create_order(payload(number), 'bench')
+
+
+def bench_async_client(url, count, concurrency):
+    async def run():
+        async with AsyncVoxShipsClient(url) as client:
+            await client.create_orders([(payload(number), 'bench') for number in range(count)], concurrency=concurrency)
+    asyncio.run(run())
+
+
+def report(name, count, seconds):
+    print(f'{name:<24} {count / seconds:>10.1f} orders/sec  {seconds / count * 1000:>8.2f} ms/order')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare createOrder submission strategies against a local fake API.')
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.0, help='server side delay per order in seconds')
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    with FakeVoxShipsServer(latency=args.latency) as server:
+        for name, run in (
+            ('requests.post', lambda: bench_requests_post(server.url, args.orders)),
+            ('VoxShipsClient', lambda: bench_session_client(server.url, args.orders)),
+            ('AsyncVoxShipsClient', lambda: bench_async_client(server.url, args.orders, args.concurrency)),
+        ):
+            start = time.perf_counter()
+            run()
+            report(name, args.orders, time.perf_counter() - start)
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+from urllib.parse import urlsplit
+
+
+class CrawlFrontier:
+    """Resumable queue of search result pages plus a global set of seen product URLs.
+
+    Each search term is crawled from page 1 up to `max_pages`, stopping early
+    at the first page without products. The queue, the pages in flight, the
+    finished pages and the product URLs already scraped are written to
+    `state_file` after every completed page, so an interrupted crawl started
+    again with the same state file skips everything it already finished.
+    finish() deletes the state once the whole crawl is done.
+    """
+
+    def __init__(self, state_file="crawl_state.json", max_pages=5):
+        self.state_file = state_file
+        self.max_pages = max_pages
+        self.queue = []
+        self.in_flight = []
+        self.done_pages = set()
+        self.seen_products = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Pages that were being fetched when the last run stopped are fetched again.
+        self.queue = state.get("in_flight", []) + state.get("queue", [])
+        self.done_pages = set(state.get("done_pages", []))
+        self.seen_products = set(state.get("seen_products", []))
+        print(f"Resuming crawl: {len(self.queue)} pages queued, {len(self.done_pages)} done")
+
+    def save(self):
+        with self._lock:
+            state = {
+                "queue": self.queue,
+                "in_flight": self.in_flight,
+                "done_pages": sorted(self.done_pages),
+                "seen_products": sorted(self.seen_products),
+            }
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_file)
+
+    @staticmethod
+    def page_url(url_template, term, page):
+        return url_template.format(term.replace(" ", "%20")) + f"&page={page}"
+
+    def seed(self, term, url_template):
+        """Queues page 1 of `term` unless it is already queued, in flight or done."""
+        entry = {"term": term, "template": url_template, "page": 1,
+                 "url": self.page_url(url_template, term, 1)}
+        with self._lock:
+            known = {e["url"] for e in self.queue + self.in_flight} | self.done_pages
+            if entry["url"] not in known:
+                self.queue.append(entry)
+
+    def take(self, count):
+        """Moves up to `count` pages from the queue to in flight and returns them."""
+        with self._lock:
+            batch, self.queue = self.queue[:count], self.queue[count:]
+            self.in_flight.extend(batch)
+            return batch
+
+    def complete(self, entry, found_products):
+        """Marks a page done and queues the next page of its term while results continue."""
+        with self._lock:
+            self.in_flight.remove(entry)
+            self.done_pages.add(entry["url"])
+            if found_products and entry["page"] < self.max_pages:
+                page = entry["page"] + 1
+                url = self.page_url(entry["template"], entry["term"], page)
+                if url not in self.done_pages:
+                    self.queue.append(dict(entry, page=page, url=url))
+        self.save()
+
+    def add_product(self, url):
+        """Records a product URL; False if it was already seen in this crawl."""
+        key = urlsplit(url)._replace(query="", fragment="").geturl()
+        with self._lock:
+            if key in self.seen_products:
+                return False
+            self.seen_products.add(key)
+            return True
+
+    def finish(self):
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
@@ -0,0 +1,176 @@
+import json
+import os
+import random
+import re
+import threading
+import zlib
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def name_tokens(name):
+    """Lower-cased word tokens of a product title, ignoring punctuation."""
+    return set(re.findall(r"[a-z0-9]+(?:\.[0-9]+)?", (name or "").lower()))
+
+
+def model_tokens(name):
+    """Tokens of a product title outside its last parenthesised group.
+
+    Listings of one model differ only in that group, e.g. "(Obsidian, 128 GB)"
+    in "Google Pixel 7 Pro (Obsidian, 128 GB)"; any other difference, such
+    as "Plus" or "(4th Gen)", is a different model.
+    """
+    title = (name or "").lower()
+    start = title.rfind("(")
+    end = title.find(")", start)
+    if start != -1 and end != -1:
+        title = title[:start] + " " + title[end + 1:]
+    return frozenset(name_tokens(title))
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class MinHasher:
+    """MinHash signatures of token sets with `num_perm` universal hash functions."""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    def signature(self, tokens):
+        hashes = [zlib.crc32(token.encode("utf-8")) for token in tokens] or [0]
+        return [min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes) for a, b in self.params]
+
+
+class DedupIndex:
+    """Finds near-duplicate products by title (MinHash/LSH) and image (dHash).
+
+    Titles are indexed with MinHash signatures split into `bands` LSH bands,
+    image hashes by each of their 8 bytes; lookups only compare against
+    entries sharing a bucket, never the whole index. A candidate is a
+    duplicate when it has the same model (see model_tokens) and either
+      - its title Jaccard similarity is at least `name_threshold` and, when
+        both have an image hash, the images are within `image_distance` bits, or
+      - the images are within `strict_image_distance` bits and the titles
+        are at least `loose_name_threshold` similar.
+    Entries (key, name, image hash) are kept in a JSON file; buckets are
+    rebuilt from it on load.
+    """
+
+    def __init__(self, path="dedup_index.json", num_perm=64, bands=16, name_threshold=0.7,
+                 loose_name_threshold=0.4, image_distance=10, strict_image_distance=4):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.name_threshold = name_threshold
+        self.loose_name_threshold = loose_name_threshold
+        self.image_distance = image_distance
+        self.strict_image_distance = strict_image_distance
+        self.hasher = MinHasher(num_perm)
+        self.entries = {}
+        self.name_buckets = {}
+        self.image_buckets = {}
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in entries.items():
+            self._insert(key, entry["name"], entry.get("image_hash"))
+
+    def save(self):
+        with self._lock:
+            data = json.dumps({key: {"name": entry["name"], "image_hash": entry["image_hash"]}
+                               for key, entry in self.entries.items()})
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def _name_keys(self, tokens):
+        signature = self.hasher.signature(tokens)
+        return [(band, tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    @staticmethod
+    def _image_keys(image_hash):
+        return [(band, (image_hash >> (band * 8)) & 0xFF) for band in range(8)]
+
+    def _insert(self, key, name, image_hash):
+        tokens = name_tokens(name)
+        self.entries[key] = {"name": name, "tokens": tokens, "models": model_tokens(name), "image_hash": image_hash}
+        for bucket in self._name_keys(tokens):
+            self.name_buckets.setdefault(bucket, set()).add(key)
+        if image_hash is not None:
+            for bucket in self._image_keys(image_hash):
+                self.image_buckets.setdefault(bucket, set()).add(key)
+
+    def _candidates(self, tokens, image_hash):
+        candidates = set()
+        for bucket in self._name_keys(tokens):
+            candidates |= self.name_buckets.get(bucket, set())
+        if image_hash is not None:
+            for bucket in self._image_keys(image_hash):
+                candidates |= self.image_buckets.get(bucket, set())
+        return candidates
+
+    def _is_duplicate(self, entry, tokens, models, image_hash):
+        if entry["models"] != models:
+            return False
+        similarity = jaccard(entry["tokens"], tokens)
+        distance = None
+        if image_hash is not None and entry["image_hash"] is not None:
+            distance = hamming(entry["image_hash"], image_hash)
+        if similarity >= self.name_threshold and (distance is None or distance <= self.image_distance):
+            return True
+        return distance is not None and distance <= self.strict_image_distance \
+            and similarity >= self.loose_name_threshold
+
+    def find(self, name, image_hash=None, exclude=None):
+        """Returns the key of an indexed near-duplicate of (name, image_hash), or None."""
+        tokens = name_tokens(name)
+        models = model_tokens(name)
+        with self._lock:
+            for key in sorted(self._candidates(tokens, image_hash) - {exclude}):
+                if self._is_duplicate(self.entries[key], tokens, models, image_hash):
+                    return key
+        return None
+
+    def add(self, key, name, image_hash=None):
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self._insert(key, name, image_hash)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        for bucket in self._name_keys(entry["tokens"]):
+            self.name_buckets.get(bucket, set()).discard(key)
+        if entry["image_hash"] is not None:
+            for bucket in self._image_keys(entry["image_hash"]):
+                self.image_buckets.get(bucket, set()).discard(key)
+
+    def check(self, key, name, image_hash=None):
+        """Returns the key this product duplicates, or None after indexing it as a new product.
+
+        A product already indexed under its own key is not its own duplicate.
+        """
+        with self._lock:
+            duplicate_of = self.find(name, image_hash, exclude=key)
+            if duplicate_of is None:
+                self.add(key, name, image_hash)
+        return duplicate_of
@@ -0,0 +1,143 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token, or returns the seconds until one is available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class FakeVoxShipsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+
+        if self.path != '/orders/createOrder':
+            return self.send_json(404, {'returnType': 'error', 'message': 'Not Found'})
+
+        server.count('requests')
+        if server.rate_limiter:
+            wait = server.rate_limiter.acquire()
+            if wait:
+                server.count('rate_limited')
+                return self.send_json(429, {'returnType': 'error', 'message': 'Too Many Requests'},
+                                      {'Retry-After': f'{wait:.3f}'})
+
+        delay = server.latency + random.uniform(0, server.latency_jitter)
+        if delay:
+            time.sleep(delay)
+
+        if server.error_rate and random.random() < server.error_rate:
+            server.count('errors')
+            return self.send_json(500, {'returnType': 'error', 'message': 'Internal Server Error'})
+
+        if not self.headers.get('apiToken'):
+            return self.send_json(200, {'returnType': 'error', 'message': 'Invalid API Token.'})
+
+        server.count('created')
+        self.send_json(200, {
+            'returnType': 'success',
+            'result': {'orderId': f"VOX-{body.get('orderNumber')}"}
+        })
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeVoxShipsServer(ThreadingHTTPServer):
+    """Local stand-in for the /orders/createOrder endpoint of api.voxships.com.
+
+    latency (+ a random 0..latency_jitter) is added to every accepted order,
+    error_rate is the fraction answered with a 500, and rate_limit caps the
+    accepted requests per second, answering the rest with 429 and Retry-After.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, latency_jitter=0.0,
+                 error_rate=0.0, rate_limit=None, burst=None):
+        super().__init__((host, port), FakeVoxShipsHandler)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limiter = RateLimiter(rate_limit, burst) if rate_limit else None
+        self.stats = {'requests': 0, 'created': 0, 'errors': 0, 'rate_limited': 0}
+        self.stats_lock = threading.Lock()
+        self.thread = None
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a local fake of the VoxShips createOrder API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every order')
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of orders answered with a 500')
+    parser.add_argument('--rate-limit', type=float, default=None, help='accepted orders per second')
+    parser.add_argument('--burst', type=float, default=None)
+    args = parser.parse_args()
+
+    server = FakeVoxShipsServer(args.host, args.port, args.latency, args.latency_jitter,
+                                args.error_rate, args.rate_limit, args.burst)
+    print(f'Fake VoxShips API listening on {server.url}')
+    server.serve_forever()
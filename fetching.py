@@ -0,0 +1,315 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from politeness import shared_scheduler
+
+try:
+    from selenium import webdriver
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions
+    from selenium.webdriver.support.ui import WebDriverWait
+except ImportError:
+    webdriver = None
+
+
+BROWSER_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+class PoliteSession(requests.Session):
+    """A requests.Session whose requests all go through a PolitenessScheduler."""
+
+    def __init__(self, scheduler):
+        super().__init__()
+        self.scheduler = scheduler
+
+    def request(self, method, url, *args, **kwargs):
+        return self.scheduler.request(super().request, method, url, *args, **kwargs)
+
+
+def make_session(pool_size=10, scheduler=None):
+    """Returns a keep-alive requests.Session that looks like a desktop browser.
+
+    Requests are paced per host by `scheduler`, by default the process-wide
+    one shared by every scraper.
+    """
+    session = PoliteSession(scheduler or shared_scheduler())
+    session.headers.update(BROWSER_HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Requests Chrome never needs to make for scraping: the DOM (and so every img src) is there without them.
+BLOCKED_URL_PATTERNS = [
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.m3u8", "*.mp3", "*.ogg",
+]
+
+
+def chrome_options(*arguments, headless=True):
+    """Chrome options tuned for scraping.
+
+    Page loads are 'eager' (they return at DOMContentLoaded instead of
+    waiting for every subresource), images are disabled in the profile and
+    `arguments` are added as extra command-line switches.
+    """
+    if webdriver is None:
+        raise RuntimeError("chrome_options requires the 'selenium' package")
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.media_stream": 2,
+    })
+    options.page_load_strategy = "eager"
+    for argument in arguments:
+        options.add_argument(argument)
+    return options
+
+
+def make_chrome_driver(options=None, block_resources=True):
+    """Starts Chrome; with block_resources, image, font and media requests are blocked at the network level."""
+    if webdriver is None:
+        raise RuntimeError("make_chrome_driver requires the 'selenium' package")
+    driver = webdriver.Chrome(options=options or chrome_options())
+    if block_resources:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+
+class DriverPool:
+    """A bounded pool of reusable browser drivers.
+
+    At most `size` drivers exist at once and are created on demand by
+    `factory`. A driver is quit and replaced after `max_pages` page loads to
+    contain Chrome's memory growth, and immediately if a page load raises
+    (crashed browser or chromedriver); the page is then retried on a fresh one.
+    With `wait_selector`, render() waits up to `wait_timeout` seconds for a
+    matching element before reading the page source.
+    """
+
+    def __init__(self, factory, size=2, max_pages=50, retries=1, wait_selector=None, wait_timeout=10):
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self.retries = retries
+        self.wait_selector = wait_selector
+        self.wait_timeout = wait_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._drivers = set()
+
+    def render(self, url):
+        """Loads url in a pooled driver and returns its page source."""
+        for attempt in range(self.retries + 1):
+            driver, pages = self._acquire()
+            try:
+                driver.get(url)
+                self._wait(driver, url)
+                html = driver.page_source
+            except Exception as e:
+                print(f"Driver failed on {url}, replacing it:", e)
+                self._release(driver, pages, broken=True)
+                if attempt == self.retries:
+                    raise
+                continue
+            self._release(driver, pages + 1)
+            return html
+
+    def _wait(self, driver, url):
+        if not self.wait_selector:
+            return
+        try:
+            WebDriverWait(driver, self.wait_timeout).until(
+                expected_conditions.presence_of_element_located((By.CSS_SELECTOR, self.wait_selector))
+            )
+        except TimeoutException:
+            # Not a broken driver: the page may simply have no results.
+            print(f"Timed out waiting for {self.wait_selector!r} on {url}")
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            driver = self.factory()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._drivers.add(driver)
+        return driver, 0
+
+    def _release(self, driver, pages, broken=False):
+        if broken or pages >= self.max_pages:
+            self._quit(driver)
+        else:
+            self._idle.put((driver, pages))
+        self._slots.release()
+
+    def _quit(self, driver):
+        with self._lock:
+            self._drivers.discard(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            drivers = list(self._drivers)
+        for driver in drivers:
+            self._quit(driver)
+        self._idle = queue.LifoQueue()
+
+
+class PageFetcher:
+    """Fetches pages over plain HTTP first and only falls back to Selenium when needed.
+
+    `extract` turns page HTML into whatever the scraper needs (usually the
+    product containers). If the server-rendered HTML already yields a
+    non-empty result it is returned directly; otherwise the page is loaded in
+    a DriverPool of up to `drivers` browsers made by `driver_factory` (none
+    are started until the first fallback) and extracted again. fetch() is
+    safe to call from several threads at once.
+
+    With a ResponseCache both the HTTP responses and the rendered pages are
+    cached, so warm runs mostly skip the network and the browser. Requests
+    and browser page loads are paced per host by `scheduler` (the shared one
+    by default). `wait_selector` is the CSS selector of the product
+    containers the browser waits for.
+    """
+
+    def __init__(self, driver_factory, session=None, timeout=15, drivers=1, max_pages_per_driver=50, cache=None,
+                 scheduler=None, wait_selector=None):
+        self.scheduler = scheduler or shared_scheduler()
+        self.session = session or make_session(pool_size=max(10, drivers * 2), scheduler=self.scheduler)
+        self.timeout = timeout
+        self.cache = cache
+        self.driver_pool = DriverPool(driver_factory, size=drivers, max_pages=max_pages_per_driver,
+                                      wait_selector=wait_selector)
+
+    def fetch(self, url, extract):
+        html = self.get_http(url)
+        if html:
+            result = extract(html)
+            if result:
+                return result
+        print(f"No products in HTTP response, rendering with Selenium: {url}")
+        return extract(self.get_rendered(url))
+
+    def get_http(self, url):
+        try:
+            if self.cache is not None:
+                return self.cache.get_text(self.session, url, self.timeout)
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"HTTP fetch failed for {url}:", e)
+            return None
+        return response.text
+
+    def get_rendered(self, url):
+        if self.cache is None:
+            return self.render(url)
+        key = "rendered:" + url
+        html, entry = self.cache.lookup(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.touch(key)
+            return html
+        html = self.render(url)
+        self.cache.store(key, html)
+        return html
+
+    def render(self, url):
+        # Browser page loads count against the same per-host limits as plain requests.
+        with self.scheduler.slot(url):
+            return self.driver_pool.render(url)
+
+    def close(self):
+        self.driver_pool.close()
+        self.session.close()
+
+
+class ImageDownloader:
+    """Downloads images in the background so page parsing never waits on them.
+
+    All downloads share one keep-alive session, paced by the shared
+    PolitenessScheduler. At most `max_workers` requests run at once, and at
+    most `per_host` of them against the same host. submit() returns a Future resolving to the result of
+    `on_success(content)`, or to None if the download failed.
+    """
+
+    def __init__(self, max_workers=8, per_host=4, timeout=10, session=None):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.session = session or make_session(pool_size=max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-download")
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def submit(self, url, on_success=None):
+        return self._executor.submit(self._run, url, on_success)
+
+    def run(self, fn, *args):
+        """Runs fn(*args) on the download pool, e.g. a conditional fetch built on request()."""
+        return self._executor.submit(fn, *args)
+
+    def download(self, url):
+        """Returns the image bytes, or None on any HTTP or network error."""
+        response = self.request(url)
+        return response.content if response is not None else None
+
+    def request(self, url, headers=None):
+        """GETs url within its host's concurrency limit; returns the response, or None on error.
+
+        A 304 Not Modified is returned as is for conditional requests.
+        """
+        with self._slot(urlsplit(url).netloc):
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code != 304:
+                    response.raise_for_status()
+            except requests.RequestException as e:
+                print(f"Failed to download image {url}:", e)
+                return None
+        return response
+
+    def _run(self, url, on_success):
+        content = self.download(url)
+        if content is None:
+            return None
+        return on_success(content) if on_success else content
+
+    def _slot(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        self.session.close()
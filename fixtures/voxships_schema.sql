@@ -0,0 +1,46 @@
+-- Minimal subset of the vox schema read and written by order.py.
+-- Used by bench_order_processor.py; safe to load into an empty database.
+
+CREATE TABLE IF NOT EXISTS InventoryOwner (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    apiToken VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ShippingAddress (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    firstName VARCHAR(100),
+    lastName VARCHAR(100),
+    address1 VARCHAR(255),
+    address2 VARCHAR(255),
+    city VARCHAR(100),
+    state VARCHAR(100),
+    zip VARCHAR(20),
+    country VARCHAR(100),
+    phoneNumber VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS Sale (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    customerId INT NOT NULL,
+    memberId INT NOT NULL,
+    badgeId INT NOT NULL,
+    inventoryOwnerId INT NOT NULL,
+    shippingAddressId INT,
+    status INT NOT NULL DEFAULT 0,
+    nonVoxFulfilled VARCHAR(1) NOT NULL DEFAULT '0',
+    flag INT NULL,
+    apiComment VARCHAR(255) NULL,
+    email VARCHAR(255),
+    shipMethod VARCHAR(50),
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_sale_pending (status, nonVoxFulfilled, flag)
+);
+
+CREATE TABLE IF NOT EXISTS PurchasedItems (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    saleId INT NOT NULL,
+    sku VARCHAR(100),
+    quantity INT,
+    name VARCHAR(255),
+    KEY idx_purchased_items_sale (saleId)
+);
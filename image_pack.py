@@ -0,0 +1,221 @@
+import argparse
+import hashlib
+import io
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+RECORD_HEADER = struct.Struct("<QIH")
+
+
+@contextmanager
+def file_lock(f):
+    """Holds an exclusive OS lock on the open file f, shared by every process using it."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ImagePack:
+    """Append-only image archive: one blob file plus an offset index.
+
+    <name>.pack holds the image bytes back to back; <name>.idx holds one
+    record per image (offset, length, key). Writing a key again appends a
+    new copy and the latest record wins. Reads go through a memory map of
+    the blob, so getting an image costs no open() call and no directory
+    lookup. The blob is always written before its index record. After a
+    crash, a torn trailing record, or one that points past the end of the
+    blob, is cut off on the next open.
+
+    Several processes may share a pack (both scrapers default to
+    scarp_images/images.pack): appends take an OS lock on <name>.lock, and
+    keys another process added are picked up from the index tail on a miss.
+    """
+
+    def __init__(self, directory, name="images"):
+        self.directory = directory
+        self.blob_path = os.path.join(directory, f"{name}.pack")
+        self.index_path = os.path.join(directory, f"{name}.idx")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self.offsets = {}
+        self._index_size = 0
+        self._lock = threading.Lock()
+        self._map = None
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(self.lock_path, "a+b")
+        self._blob = open(self.blob_path, "ab+")
+        with file_lock(self._lock_file):
+            self._load_index()
+        self._index = open(self.index_path, "ab")
+
+    def _read_index(self):
+        """Reads the complete records appended to the index since the last read; returns the leftover bytes."""
+        blob_size = os.path.getsize(self.blob_path)
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_size)
+                data = f.read()
+        except OSError:
+            return 0
+        position = 0
+        while position + RECORD_HEADER.size <= len(data):
+            offset, length, key_length = RECORD_HEADER.unpack_from(data, position)
+            end = position + RECORD_HEADER.size + key_length
+            if end > len(data) or offset + length > blob_size:
+                break
+            key = data[position + RECORD_HEADER.size:end].decode("utf-8")
+            self.offsets[key] = (offset, length)
+            position = end
+        self._index_size += position
+        return len(data) - position
+
+    def _load_index(self):
+        leftover = self._read_index()
+        if leftover:
+            print(f"Discarding {leftover} bytes of incomplete index in {self.index_path}")
+            with open(self.index_path, "r+b") as f:
+                f.truncate(self._index_size)
+
+    def _refresh(self):
+        """Picks up records other processes appended; called with self._lock held."""
+        try:
+            if os.path.getsize(self.index_path) > self._index_size:
+                self._read_index()
+        except OSError:
+            pass
+
+    @staticmethod
+    def key_for(data):
+        return hashlib.sha256(data).hexdigest() + ".jpg"
+
+    def __contains__(self, key):
+        with self._lock:
+            if key not in self.offsets:
+                self._refresh()
+            return key in self.offsets
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self.offsets)
+
+    def keys(self):
+        with self._lock:
+            self._refresh()
+            return list(self.offsets)
+
+    def put(self, data, key=None, replace=False):
+        """Appends data under key (by default its content hash) and returns the key.
+
+        An existing key is kept as it is unless replace=True.
+        """
+        key = key or self.key_for(data)
+        with self._lock, file_lock(self._lock_file):
+            # Catch up with what other processes appended (and cut a torn record a crashed one left).
+            self._load_index()
+            if key in self.offsets and not replace:
+                return key
+            self._blob.seek(0, os.SEEK_END)
+            offset = self._blob.tell()
+            self._blob.write(data)
+            self._blob.flush()
+            encoded = key.encode("utf-8")
+            record = RECORD_HEADER.pack(offset, len(data), len(encoded)) + encoded
+            self._index.write(record)
+            self._index.flush()
+            self._index_size += len(record)
+            self.offsets[key] = (offset, len(data))
+        return key
+
+    def get(self, key):
+        """Returns the bytes stored under key, or None."""
+        with self._lock:
+            location = self.offsets.get(key)
+            if location is None:
+                self._refresh()
+                location = self.offsets.get(key)
+            if location is None:
+                return None
+            offset, length = location
+            if length == 0:
+                return b""
+            if self._map is None or offset + length > len(self._map):
+                # The blob grew since it was mapped; map it again at its current size.
+                if self._map is not None:
+                    self._map.close()
+                self._map = mmap.mmap(self._blob.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map[offset:offset + length]
+
+    def open(self, key):
+        """Returns the image under key as a file-like object (for PIL or openpyxl), or None."""
+        data = self.get(key)
+        return io.BytesIO(data) if data is not None else None
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._blob.close()
+            self._index.close()
+            self._lock_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def pack_directory(directory, remove=False, extensions=(".jpg", ".jpeg", ".png", ".webp")):
+    """Moves the loose images of directory (and its variants/ subdirectory) into its pack.
+
+    Files are packed under their path relative to directory, so existing
+    names keep working as keys. Returns the number of files packed.
+    """
+    packed = 0
+    with ImagePack(directory) as pack:
+        for root, _, names in os.walk(directory):
+            for name in sorted(names):
+                if not name.lower().endswith(extensions):
+                    continue
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    pack.put(f.read(), key)
+                packed += 1
+                if remove:
+                    os.remove(path)
+    print(f"Packed {packed} images from {directory} into {pack.blob_path}")
+    return packed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move loose scraped images into packed archives.")
+    parser.add_argument("directories", nargs="*", default=["downloaded_images", "scarp_images"])
+    parser.add_argument("--remove", action="store_true", help="delete the loose files once packed")
+    args = parser.parse_args()
+    for directory in args.directories:
+        if os.path.isdir(directory):
+            pack_directory(directory, remove=args.remove)
+        else:
+            print(f"Skipping {directory}: not a directory")
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+
+
+class ImageStore:
+    """Content-addressed image files with a URL index for conditional re-fetching.
+
+    Every image is written once as <sha256 of its bytes>.jpg, so the same
+    picture scraped again (under any product name or URL) maps to the same
+    file and the same storage object. index.json remembers, per image URL,
+    the hash plus the ETag / Last-Modified validators of the last download;
+    fetch() sends them back and a 304 costs neither a disk write nor an upload.
+    With a `pack` (an ImagePack) images are appended to it instead of being
+    written as loose files; read() works the same either way.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, image_dir, pack=None):
+        self.image_dir = image_dir
+        self.index_path = os.path.join(image_dir, self.INDEX_FILE)
+        self.pack = pack
+        self._lock = threading.Lock()
+        os.makedirs(image_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def filename_for(content):
+        return hashlib.sha256(content).hexdigest() + ".jpg"
+
+    def path(self, filename):
+        return os.path.join(self.image_dir, filename)
+
+    def exists(self, filename):
+        if self.pack is not None:
+            return filename in self.pack
+        return os.path.exists(self.path(filename))
+
+    def read(self, filename):
+        """Returns the stored bytes of filename, or None."""
+        if self.pack is not None:
+            return self.pack.get(filename)
+        try:
+            with open(self.path(filename), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, content):
+        """Stores image bytes unless an identical image already exists; returns its filename."""
+        filename = self.filename_for(content)
+        if self.pack is not None:
+            return self.pack.put(content, filename)
+        path = self.path(filename)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return filename
+
+    def fetch(self, url, downloader):
+        """Returns the stored filename for url, downloading only if the image changed.
+
+        `downloader` is a fetching.ImageDownloader; None is returned when the
+        image could not be downloaded.
+        """
+        with self._lock:
+            entry = self.index.get(url)
+
+        headers = {}
+        if entry and self.exists(entry["filename"]):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = downloader.request(url, headers=headers or None)
+        if response is None:
+            return None
+        if response.status_code == 304 and headers:
+            return entry["filename"]
+
+        filename = self.put(response.content)
+        with self._lock:
+            self.index[url] = {
+                "filename": filename,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+        return filename
+
+    def save_index(self):
+        with self._lock:
+            data = json.dumps(self.index)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,208 @@
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+VARIANTS_DIR = "variants"
+THUMBNAIL_SIZE = (60, 60)
+WEBP_SIZE = (800, 800)
+
+
+def variant_paths(source_path, variants_dir=None):
+    """Returns the (thumbnail, webp) paths of an image's variants.
+
+    Variants go to a `variants` directory next to the source image, named
+    after its file stem, so content-hashed sources keep content-hashed variants.
+    """
+    directory = variants_dir or os.path.join(os.path.dirname(source_path), VARIANTS_DIR)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(directory, f"{stem}_thumb.jpg"), os.path.join(directory, f"{stem}.webp")
+
+
+def dhash(img, size=8):
+    """64-bit difference hash: brightness gradients of a 9x8 grayscale copy, robust to resizing and re-encoding."""
+    pixels = list(img.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            value = (value << 1) | (left > pixels[row * (size + 1) + col + 1])
+    return value
+
+
+def _is_current(path, source_mtime):
+    try:
+        return os.path.getmtime(path) >= source_mtime
+    except OSError:
+        return False
+
+
+def _write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def render_variants(img, thumbnail_size=THUMBNAIL_SIZE, webp_size=WEBP_SIZE, quality=80):
+    """Encodes an opened image as (webp bytes, JPEG thumbnail bytes, dHash of the thumbnail)."""
+    # draft() lets the JPEG decoder skip straight to a reduced scale.
+    img.draft("RGB", webp_size)
+    img = img.convert("RGB")
+    img.thumbnail(webp_size)
+    webp = io.BytesIO()
+    img.save(webp, format="WEBP", quality=quality, method=4)
+    img.thumbnail(thumbnail_size)
+    thumbnail = io.BytesIO()
+    img.save(thumbnail, format="JPEG", quality=85, optimize=True)
+    return webp.getvalue(), thumbnail.getvalue(), dhash(img)
+
+
+def transcode_image(source_path, variants_dir=None, thumbnail_size=THUMBNAIL_SIZE, webp_size=WEBP_SIZE,
+                    quality=80):
+    """Writes a JPEG thumbnail and a downsized WebP copy of source_path.
+
+    Runs in a worker process. Variants newer than the source are left alone,
+    so re-running over a directory only converts new images. Returns
+    {"thumbnail": path, "webp": path, "dhash": int}, or None if the image
+    cannot be read. The dHash is taken from the thumbnail.
+    """
+    thumbnail_path, webp_path = variant_paths(source_path, variants_dir)
+    try:
+        source_mtime = os.path.getmtime(source_path)
+        if _is_current(thumbnail_path, source_mtime) and _is_current(webp_path, source_mtime):
+            with Image.open(thumbnail_path) as thumbnail:
+                return {"thumbnail": thumbnail_path, "webp": webp_path, "dhash": dhash(thumbnail)}
+
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+        with Image.open(source_path) as img:
+            webp, thumbnail, image_hash = render_variants(img, thumbnail_size, webp_size, quality)
+        _write(webp_path, webp)
+        _write(thumbnail_path, thumbnail)
+    except OSError as e:
+        print(f"Failed to transcode {source_path}: {e}")
+        return None
+    return {"thumbnail": thumbnail_path, "webp": webp_path, "dhash": image_hash}
+
+
+def transcode_bytes(data, thumbnail_size=THUMBNAIL_SIZE, webp_size=WEBP_SIZE, quality=80):
+    """Like transcode_image for images kept in memory or in an ImagePack; nothing touches the disk.
+
+    Returns {"thumbnail": bytes, "webp": bytes, "dhash": int}, or None if
+    the bytes are not a readable image.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            webp, thumbnail, image_hash = render_variants(img, thumbnail_size, webp_size, quality)
+    except OSError as e:
+        print(f"Failed to transcode image: {e}")
+        return None
+    return {"thumbnail": thumbnail, "webp": webp, "dhash": image_hash}
+
+
+class ImageTranscoder:
+    """Process pool producing thumbnail and WebP variants of downloaded images.
+
+    Resizing and encoding are CPU bound, so they run in separate processes
+    instead of on the download threads. submit() returns a Future of
+    transcode_image's result for a file, submit_bytes() one of
+    transcode_bytes' result for image bytes.
+    """
+
+    def __init__(self, max_workers=None, variants_dir=None, thumbnail_size=THUMBNAIL_SIZE, webp_size=WEBP_SIZE):
+        if Image is None:
+            raise RuntimeError("ImageTranscoder requires the 'Pillow' package")
+        self.variants_dir = variants_dir
+        self.thumbnail_size = thumbnail_size
+        self.webp_size = webp_size
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    def submit(self, source_path):
+        return self.executor.submit(transcode_image, source_path, self.variants_dir,
+                                    self.thumbnail_size, self.webp_size)
+
+    def submit_bytes(self, data):
+        return self.executor.submit(transcode_bytes, data, self.thumbnail_size, self.webp_size)
+
+    def transcode(self, source_path):
+        return self.submit(source_path).result()
+
+    def transcode_bytes(self, data):
+        return self.submit_bytes(data).result()
+
+    def transcode_packed(self, pack, key):
+        """transcode() for an image stored in an ImagePack.
+
+        The variants are stored in the same pack under variants/<stem>_thumb.jpg
+        and variants/<stem>.webp, and {"thumbnail": key, "webp": key,
+        "dhash": int} is returned (None if the image cannot be read). Keys are
+        expected to name their content, so existing variants are reused.
+        """
+        stem = os.path.splitext(key)[0]
+        thumbnail_key = f"{VARIANTS_DIR}/{stem}_thumb.jpg"
+        webp_key = f"{VARIANTS_DIR}/{stem}.webp"
+        if thumbnail_key in pack and webp_key in pack:
+            with Image.open(pack.open(thumbnail_key)) as thumbnail:
+                return {"thumbnail": thumbnail_key, "webp": webp_key, "dhash": dhash(thumbnail)}
+
+        data = pack.get(key)
+        variants = self.transcode_bytes(data) if data is not None else None
+        if variants is None:
+            return None
+        pack.put(variants["webp"], webp_key, replace=True)
+        pack.put(variants["thumbnail"], thumbnail_key, replace=True)
+        return {"thumbnail": thumbnail_key, "webp": webp_key, "dhash": variants["dhash"]}
+
+    def close(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def find_images(directory):
+    """Lists the source images directly inside directory (variants are skipped)."""
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError as e:
+        print(f"Skipping {directory}: {e}")
+        return []
+    return [os.path.join(directory, name) for name in names
+            if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(directory, name))]
+
+
+def backfill(directories, max_workers=None):
+    """Transcodes every image already in `directories` using all cores; returns (converted, failed)."""
+    sources = [path for directory in directories for path in find_images(directory)]
+    print(f"Transcoding {len(sources)} images with {max_workers or os.cpu_count()} processes")
+    started = time.perf_counter()
+    converted = failed = 0
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        chunksize = max(1, len(sources) // ((max_workers or os.cpu_count() or 1) * 4))
+        for result in executor.map(transcode_image, sources, chunksize=chunksize):
+            if result is None:
+                failed += 1
+            else:
+                converted += 1
+    print(f"Done in {time.perf_counter() - started:.1f}s: {converted} transcoded, {failed} failed")
+    return converted, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create thumbnail and WebP variants of scraped images.")
+    parser.add_argument("directories", nargs="*", default=["downloaded_images", "scarp_images"])
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+    if Image is None:
+        raise SystemExit("image_transcode requires the 'Pillow' package")
+    backfill(args.directories, args.workers)
@@ -0,0 +1,40 @@
+import dataclasses
+import json
+import sys
+import threading
+
+
+class NdjsonSink:
+    """Writes records as newline-delimited JSON, one compact line per record.
+
+    Each line is flushed as soon as it is written, so a consumer tailing the
+    file (or reading the pipe) sees products while the scrape is still
+    running. write() may be called from several threads. Records can be
+    dicts or dataclass instances. path "-" writes to stdout.
+    """
+
+    def __init__(self, path="products.ndjson", mode="w"):
+        self.path = path
+        self._file = sys.stdout if path == "-" else open(path, mode, encoding="utf-8")
+        self._lock = threading.Lock()
+        self.written = 0
+
+    def write(self, record):
+        if dataclasses.is_dataclass(record):
+            record = dataclasses.asdict(record)
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.written += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not sys.stdout:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,5 +1,183 @@
+import argparse
+import asyncio
+import signal
+import threading
+import time
 import mysql.connector
 import requests
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from voxships import TRANSPORT_ERRORS, AsyncVoxShipsClient, VoxShipsClient, order_not_taken
+
+
+ORDER_SELECT = """
+SELECT 
+    Sale.*, 
+    PurchasedItems.sku AS itemSku, 
+    PurchasedItems.quantity AS itemQuantity, 
+    PurchasedItems.name AS itemName, 
+    ShippingAddress.id AS shipId, 
+    ShippingAddress.firstName AS shipFirstName, 
+    ShippingAddress.lastName AS shipLastName, 
+    ShippingAddress.address1 AS shipAddress1, 
+    ShippingAddress.address2 AS shipAddress2, 
+    ShippingAddress.city AS shipCity, 
+    ShippingAddress.state AS shipState, 
+    ShippingAddress.zip AS shipZip, 
+    ShippingAddress.country AS shipCountry, 
+    ShippingAddress.phoneNumber AS shipPhoneNumber 
+FROM 
+    Sale
+LEFT JOIN 
+    PurchasedItems ON PurchasedItems.saleId = Sale.id
+LEFT JOIN 
+    ShippingAddress ON ShippingAddress.id = Sale.shippingAddressId
+"""
+
+# Sale.flag values written back: submitted, failed (the API said why), and
+# sent without a usable answer, so it may exist at VoxShips and must be
+# reconciled by hand rather than submitted again.
+FLAG_SUBMITTED = 1
+FLAG_FAILED = 2
+FLAG_OUTCOME_UNKNOWN = 3
+
+ITEM_COLUMNS = ('itemSku', 'itemQuantity', 'itemName')
+
+ADDRESS_COLUMNS = (
+    'shipId', 'shipFirstName', 'shipLastName', 'shipAddress1', 'shipAddress2',
+    'shipCity', 'shipState', 'shipZip', 'shipCountry', 'shipPhoneNumber'
+)
+
+
+@dataclass
+class OrderItem:
+    sku: str
+    quantity: int
+    name: str
+
+    def to_api(self):
+        return {
+            'itemSkuNumber': self.sku,
+            'itemQty': self.quantity,
+            'itemName': self.name
+        }
+
+
+@dataclass
+class ShippingAddress:
+    firstName: str
+    lastName: str
+    address1: str
+    address2: Optional[str]
+    city: str
+    state: str
+    zip: str
+    country: str
+    phoneNumber: Optional[str]
+
+    def to_api(self, email):
+        return {
+            'firstName': self.firstName,
+            'lastName': self.lastName,
+            'email': email,
+            'address1': self.address1,
+            'address2': self.address2,
+            'city': self.city,
+            'state': self.state,
+            'zip': self.zip,
+            'country': self.country,
+            'phone1': self.phoneNumber,
+        }
+
+
+@dataclass
+class Order:
+    """A sale together with its purchased items and shipping address."""
+    sale: dict
+    items: List[OrderItem] = field(default_factory=list)
+    shipping_address: Optional[ShippingAddress] = None
+
+    @property
+    def id(self):
+        return self.sale['id']
+
+
+def fold_order_rows(rows):
+    """Folds the joined rows of ORDER_SELECT into one Order per sale, keeping row order."""
+    orders = {}
+    for row in rows:
+        order = orders.get(row['id'])
+        if order is None:
+            sale = {k: v for k, v in row.items() if k not in ITEM_COLUMNS and k not in ADDRESS_COLUMNS}
+            address = None
+            if row['shipId'] is not None:
+                address = ShippingAddress(
+                    firstName=row['shipFirstName'],
+                    lastName=row['shipLastName'],
+                    address1=row['shipAddress1'],
+                    address2=row['shipAddress2'],
+                    city=row['shipCity'],
+                    state=row['shipState'],
+                    zip=row['shipZip'],
+                    country=row['shipCountry'],
+                    phoneNumber=row['shipPhoneNumber'],
+                )
+            order = orders[row['id']] = Order(sale=sale, shipping_address=address)
+        if row['itemSku'] is not None:
+            order.items.append(OrderItem(row['itemSku'], row['itemQuantity'], row['itemName']))
+    return list(orders.values())
+
+
+class TokenCache:
+    """Thread-safe LRU cache with a per-entry time to live.
+
+    Shared by every worker thread of an OrderProcessor so the few inventory
+    owners behind most orders are looked up once per ttl instead of per order.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Drops one key, or every entry when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
 
 class Database:
     def __init__(self, host, user, password, database):
@@ -8,53 +186,69 @@ class Database:
         self.password = password
         self.database = database
 
+    def connect(self):
+        return mysql.connector.connect(
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            database=self.database
+        )
+
+    @contextmanager
+    def transaction(self):
+        """Yields a Transaction on one connection, committed on success and rolled back on error."""
+        connection = self.connect()
+        try:
+            yield Transaction(connection)
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
     def execute_query(self, query, params=None):
+        connection = cursor = None
         try:
-            connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
-            cursor = connection.cursor()
+            connection = self.connect()
+            cursor = connection.cursor(dictionary=True)
             cursor.execute(query, params)
-            result = cursor.fetchall()
+            result = cursor.fetchall() if cursor.with_rows else None
             connection.commit()
             return result
         except mysql.connector.Error as err:
             return None
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+
+
+class Transaction:
+    """Runs queries on a single open connection; errors propagate so the caller can roll back."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute_query(self, query, params=None):
+        cursor = self.connection.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall() if cursor.with_rows else None
         finally:
             cursor.close()
-            connection.close()
 
 
 class OrderProcessor:
-    def __init__(self, db, api_url):
+    def __init__(self, db, api_url, client=None, token_cache=None):
         self.db = db
         self.api_url = api_url
+        self.client = client or VoxShipsClient(api_url)
+        self.token_cache = token_cache if token_cache is not None else TokenCache()
 
     def get_order(self, customer_id, member_id, badge_id, sale_id):
-        query = """
-        SELECT 
-            Sale.*, 
-            PurchasedItems.sku, 
-            PurchasedItems.quantity, 
-            PurchasedItems.name, 
-            ShippingAddress.firstName, 
-            ShippingAddress.lastName, 
-            ShippingAddress.address1, 
-            ShippingAddress.address2, 
-            ShippingAddress.city, 
-            ShippingAddress.state, 
-            ShippingAddress.zip, 
-            ShippingAddress.country, 
-            ShippingAddress.phoneNumber 
-        FROM 
-            Sale
-        LEFT JOIN 
-            PurchasedItems ON PurchasedItems.saleId = Sale.id
-        LEFT JOIN 
-            ShippingAddress ON ShippingAddress.id = Sale.shippingAddressId
+        query = ORDER_SELECT + """
         WHERE 
             Sale.customerId = %s AND 
             Sale.memberId = %s AND 
@@ -65,92 +259,294 @@ class OrderProcessor:
         result = self.db.execute_query(query, params)
         return result if result else None
 
+    def load_order(self, customer_id, member_id, badge_id, sale_id):
+        """Loads a sale, its items and its shipping address in a single query."""
+        rows = self.get_order(customer_id, member_id, badge_id, sale_id)
+        if not rows:
+            return None
+        return fold_order_rows(rows)[0]
+
+    def load_orders(self, sale_ids, db=None):
+        """Loads every eligible sale in sale_ids with one IN (...) query."""
+        if not sale_ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(sale_ids))
+        query = ORDER_SELECT + f"""
+        WHERE 
+            Sale.id IN ({placeholders}) AND 
+            Sale.status = 0 AND 
+            Sale.nonVoxFulfilled = '0'
+        """
+        result = (db or self.db).execute_query(query, tuple(sale_ids))
+        return fold_order_rows(result) if result else []
+
     def get_inventory_owner_token(self, inventory_owner_id):
+        token = self.token_cache.get(inventory_owner_id)
+        if token is not None:
+            return token
+
         query = "SELECT apiToken FROM InventoryOwner WHERE id = %s"
         params = (inventory_owner_id,)
         result = self.db.execute_query(query, params)
-        return result[0]['apiToken'] if result else None
-
-    def get_item_details(self, sale_id):
-        query = """
-        SELECT sku, quantity, name FROM PurchasedItems WHERE saleId = %s
-        """
-        return self.db.execute_query(query, (sale_id,))
-
-    def get_shipping_address(self, shipping_address_id):
-        query = """
-        SELECT firstName, lastName, address1, address2, city, state, zip, country, phoneNumber
-        FROM ShippingAddress WHERE id = %s
-        """
-        result = self.db.execute_query(query, (shipping_address_id,))
-        return result[0] if result else None
+        token = result[0]['apiToken'] if result else None
+        if token is not None:
+            self.token_cache.set(inventory_owner_id, token)
+        return token
 
     def update_order_status(self, sale_id, flag, comment):
         query = "UPDATE Sale SET flag = %s, apiComment = %s WHERE id = %s"
         params = (flag, comment, sale_id)
         self.db.execute_query(query, params)
 
+    def update_order_statuses(self, statuses, db=None):
+        """Writes many (sale_id, flag, comment) results with a single UPDATE."""
+        if not statuses:
+            return
+        flag_cases = ' '.join(['WHEN %s THEN %s'] * len(statuses))
+        comment_cases = ' '.join(['WHEN %s THEN %s'] * len(statuses))
+        placeholders = ', '.join(['%s'] * len(statuses))
+        query = f"""
+        UPDATE Sale SET 
+            flag = CASE id {flag_cases} END, 
+            apiComment = CASE id {comment_cases} END 
+        WHERE id IN ({placeholders})
+        """
+        params = []
+        for sale_id, flag, _ in statuses:
+            params.extend((sale_id, flag))
+        for sale_id, _, comment in statuses:
+            params.extend((sale_id, comment))
+        params.extend(sale_id for sale_id, _, _ in statuses)
+        (db or self.db).execute_query(query, tuple(params))
+
     def process_order(self, data):
-        order = self.get_order(data['customerId'], data['memberId'], data['badgeId'], data['saleId'])
+        order = self.load_order(data['customerId'], data['memberId'], data['badgeId'], data['saleId'])
         if not order:
             return {"status": "failure", "message": "Sales Data Not Found."}
 
+        sale = order.sale
         if not data.get('apiToken'):
-            data['apiToken'] = self.get_inventory_owner_token(order['inventoryOwnerId'])
-
-        if order['status'] == 0 and order['nonVoxFulfilled'] == '0':
-            ItemDetails = []
-            item_details = self.get_item_details(order['id'])
-
-            for detail in item_details:  
-                ItemDetails.append({
-                    'itemSkuNumber': detail['sku'],
-                    'itemQty': detail['quantity'],
-                    'itemName': detail['name']
-                })
-
-            shipping_address = self.get_shipping_address(order['shippingAddressId'])
-
-            order_shipping_address = {
-                'firstName': shipping_address['firstName'],
-                'lastName': shipping_address['lastName'],
-                'email': order['email'],
-                'address1': shipping_address['address1'],
-                'address2': shipping_address['address2'],
-                'city': shipping_address['city'],
-                'state': shipping_address['state'],
-                'zip': shipping_address['zip'],
-                'country': shipping_address['country'],
-                'phone1': shipping_address['phoneNumber'],
-            }
-
-            response_data = self.create_order_api_request(order, item_details, order_shipping_address, data['apiToken'])
-
-            if response_data.get('returnType') == 'success':
-                self.update_order_status(order['id'], 1, response_data['result']['orderId'])
-            else:
-                self.update_order_status(order['id'], 2, response_data['message'])
+            data['apiToken'] = self.get_inventory_owner_token(sale['inventoryOwnerId'])
+
+        if sale['status'] == 0 and sale['nonVoxFulfilled'] == '0':
+            status = self.submit_order(order, data['apiToken'])
+            if status is None:
+                return {"status": "requeued", "message": "Order API unavailable, order left pending."}
+            self.update_order_status(*status)
+
+    def process_orders(self, sale_ids, api_token=None, max_workers=8, db=None):
+        """Submits many eligible sales concurrently and records all results in one UPDATE.
+
+        At most max_workers API requests are in flight at once. Sales are loaded
+        and updated through `db` when given (e.g. a Transaction holding their
+        row locks), otherwise through self.db. Returns the (sale_id, flag,
+        comment) tuples that were written; sales submit_order could not get an
+        answer for (see there) are left untouched so they stay pending.
+        """
+        orders = self.load_orders(sale_ids, db)
+        if not orders:
+            return []
+
+        def submit(order):
+            token = api_token or self.get_inventory_owner_token(order.sale['inventoryOwnerId'])
+            return self.submit_order(order, token)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            statuses = [status for status in executor.map(submit, orders) if status is not None]
+
+        self.update_order_statuses(statuses, db)
+        return statuses
+
+    def submit_order(self, order, api_token):
+        """Sends one order to the API and returns its (sale_id, flag, comment) result.
+
+        Returns None only when the API cannot have created the order (see
+        voxships.order_not_taken), so the sale is left pending and re-queued.
+        Errors the API reports, and answers that cannot be decoded, are
+        FLAG_FAILED. A request that may have reached the API without a usable
+        answer (read timeout, 5xx) is FLAG_OUTCOME_UNKNOWN and is never
+        submitted again automatically.
+        """
+        if order.shipping_address is None:
+            return order.id, FLAG_FAILED, 'Shipping Address Not Found.'
+
+        item_details = [item.to_api() for item in order.items]
+        order_shipping_address = order.shipping_address.to_api(order.sale['email'])
+
+        try:
+            response_data = self.create_order_api_request(order.sale, item_details, order_shipping_address, api_token)
+        except requests.JSONDecodeError as e:
+            return order.id, FLAG_FAILED, f'Invalid API response: {e}'
+        except Exception as e:
+            return self.error_status(order, e)
+
+        return self.order_status(order, response_data)
+
+    def error_status(self, order, error):
+        """(sale_id, flag, comment) for a create_order exception, or None if the order was not taken."""
+        if order_not_taken(error):
+            return None
+        if isinstance(error, TRANSPORT_ERRORS):
+            comment = f'Outcome unknown, reconcile with VoxShips: {type(error).__name__}: {error}'
+            return order.id, FLAG_OUTCOME_UNKNOWN, comment
+        raise error
+
+    async def process_orders_async(self, sale_ids, api_token=None, concurrency=50, client=None):
+        """asyncio variant of process_orders for high-concurrency submission.
+
+        Database work stays on worker threads; API calls share one aiohttp
+        connection pool with at most `concurrency` requests in flight, behind
+        the same circuit breaker as self.client. Results are classified as in
+        submit_order; sales the API cannot have taken (including ones the
+        breaker or bulkhead rejected) are left pending and not returned.
+        """
+        orders = await asyncio.to_thread(self.load_orders, sale_ids)
+        if not orders:
+            return []
+
+        statuses = {}
+        submissions = []
+        pending = []
+        for order in orders:
+            if order.shipping_address is None:
+                statuses[order.id] = (order.id, FLAG_FAILED, 'Shipping Address Not Found.')
+                continue
+            token = api_token or await asyncio.to_thread(self.get_inventory_owner_token, order.sale['inventoryOwnerId'])
+            submissions.append((self.build_order_payload(order), token))
+            pending.append(order)
+
+        if submissions:
+            # Share the sync client's breaker so both paths see the same API health.
+            client = client or AsyncVoxShipsClient(self.api_url, breaker=getattr(self.client, 'breaker', None))
+            async with client as async_client:
+                results = await async_client.create_orders(submissions, concurrency=concurrency)
+            for order, response_data in zip(pending, results):
+                if isinstance(response_data, ValueError):
+                    statuses[order.id] = (order.id, FLAG_FAILED, f'Invalid API response: {response_data}')
+                elif isinstance(response_data, Exception):
+                    status = self.error_status(order, response_data)
+                    if status is not None:
+                        statuses[order.id] = status
+                else:
+                    statuses[order.id] = self.order_status(order, response_data)
+
+        statuses = [statuses[order.id] for order in orders if order.id in statuses]
+        await asyncio.to_thread(self.update_order_statuses, statuses)
+        return statuses
+
+    def order_status(self, order, response_data):
+        """(sale_id, flag, comment) for a decoded API answer; malformed answers are FLAG_FAILED, never raised."""
+        if not isinstance(response_data, dict):
+            return order.id, FLAG_FAILED, f'Invalid API response: {response_data!r:.200}'
+        if response_data.get('returnType') == 'success':
+            result = response_data.get('result')
+            if isinstance(result, dict) and result.get('orderId'):
+                return order.id, FLAG_SUBMITTED, result['orderId']
+            return order.id, FLAG_FAILED, f'Success response without an orderId: {response_data!r:.200}'
+        return order.id, FLAG_FAILED, response_data.get('message')
+
+    def build_order_payload(self, order):
+        return self.order_payload(
+            order.sale,
+            [item.to_api() for item in order.items],
+            order.shipping_address.to_api(order.sale['email'])
+        )
+
+    def order_payload(self, order, item_details, order_shipping_address):
+        return {
+            'orderNumber': order['id'],
+            'shipMethod': order['shipMethod'],
+            'orderDate': order['created_at'],
+            'productItems': item_details,
+            'orderShippingAddress': order_shipping_address,
+        }
 
     def create_order_api_request(self, order, item_details, order_shipping_address, api_token):
-        response = requests.post(
-            f'{self.api_url}/orders/createOrder',
-            json={
-                'orderNumber': order['id'],
-                'shipMethod': order['shipMethod'],
-                'orderDate': order['created_at'],
-                'productItems': item_details,
-                'orderShippingAddress': order_shipping_address,
-            },
-            headers={'apiToken': api_token},
-            verify=False
+        return self.client.create_order(
+            self.order_payload(order, item_details, order_shipping_address),
+            api_token
         )
-        return response.json()
+
+
+class OrderWorker:
+    """Drains pending sales in batches; safe to run as many processes or hosts at once.
+
+    Each batch is claimed with SELECT ... FOR UPDATE SKIP LOCKED inside one
+    transaction that stays open until the batch's flags are written, so
+    concurrent workers skip each other's rows instead of submitting them twice.
+    If a worker dies mid-batch the transaction rolls back and the sales are
+    picked up again by the next claim. Only unflagged sales are claimed:
+    FLAG_OUTCOME_UNKNOWN sales may already exist at VoxShips and are left
+    for reconciliation.
+    """
+
+    CLAIM_QUERY = """
+    SELECT id FROM Sale 
+    WHERE 
+        status = 0 AND 
+        nonVoxFulfilled = '0' AND 
+        (flag IS NULL OR flag = 0)
+    ORDER BY id 
+    LIMIT %s 
+    FOR UPDATE SKIP LOCKED
+    """
+
+    def __init__(self, processor, batch_size=50, max_workers=8, poll_interval=5):
+        self.processor = processor
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+
+    def run_once(self):
+        """Claims and processes one batch; returns the number of sales written back.
+
+        Sales the API cannot have taken (open circuit, full bulkhead, connect
+        errors, 429/503) are not written, so committing the transaction simply
+        releases them again.
+        """
+        with self.processor.db.transaction() as tx:
+            rows = tx.execute_query(self.CLAIM_QUERY, (self.batch_size,))
+            sale_ids = [row['id'] for row in rows or []]
+            if not sale_ids:
+                return 0
+            return len(self.processor.process_orders(sale_ids, max_workers=self.max_workers, db=tx))
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                processed = self.run_once()
+            except mysql.connector.Error as e:
+                print("Order worker database error:", e)
+                processed = 0
+            except Exception as e:
+                # The batch rolled back and will be claimed again; keep the worker alive.
+                print("Order worker error:", repr(e))
+                processed = 0
+            if processed < self.batch_size:
+                self.stop_event.wait(self.poll_interval)
+
+    def stop(self, *args):
+        self.stop_event.set()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worker', action='store_true', help='keep draining pending sales until stopped')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--max-workers', type=int, default=8)
+    args = parser.parse_args()
+
     db = Database(host='localhost', user='root', password='', database='vox')
     order_processor = OrderProcessor(db, api_url='https://api.voxships.com')
-    
+
+    if args.worker:
+        worker = OrderWorker(order_processor, batch_size=args.batch_size, max_workers=args.max_workers)
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        worker.run()
+        raise SystemExit
+
     data = {
         'customerId': 123,
         'memberId': 456,
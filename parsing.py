@@ -0,0 +1,84 @@
+import threading
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+    from lxml import etree
+    PARSER = "lxml"
+except ImportError:
+    lxml = etree = None
+    PARSER = "html.parser"
+
+
+def parse_html(html, parse_only=None):
+    """Parses html with lxml when it is installed, falling back to html.parser."""
+    return BeautifulSoup(html, PARSER, parse_only=parse_only)
+
+
+def product_strainer(classes, tag="div"):
+    """A SoupStrainer keeping only `tag` elements with one of `classes` (and their contents)."""
+    return SoupStrainer(tag, class_=classes)
+
+
+def parse_product_containers(html, classes, tag="div"):
+    """Returns the product containers of a search page without building the rest of the tree.
+
+    Matches the same elements as BeautifulSoup(html).find_all(tag, class_=classes).
+    """
+    strainer = product_strainer(classes, tag)
+    return parse_html(html, parse_only=strainer).find_all(tag, class_=classes)
+
+
+def class_predicate(classes):
+    """XPath test for BeautifulSoup's class_=classes: any entry matches, and every
+    space separated class of an entry must be present."""
+    entries = []
+    for entry in classes:
+        tokens = [f"contains(concat(' ', normalize-space(@class), ' '), ' {token} ')" for token in entry.split()]
+        entries.append("(" + " and ".join(tokens) + ")")
+    return " or ".join(entries)
+
+
+class ProductGridParser:
+    """Extracts search-result fields with lxml and precompiled XPath, skipping BeautifulSoup.
+
+    parse() yields the same fields FlipkartScraper read from each container
+    through BeautifulSoup (first image's src/data-src and alt, first price
+    text, first product link href), in document order.
+    """
+
+    def __init__(self, product_classes, price_classes, link_classes, tag="div"):
+        if etree is None:
+            raise RuntimeError("ProductGridParser requires the 'lxml' package")
+        self.expressions = {
+            "containers": f"//{tag}[{class_predicate(product_classes)}]",
+            "image": "(.//img)[1]",
+            "price": f"(.//div[{class_predicate(price_classes)}])[1]",
+            "link": f"(.//a[{class_predicate(link_classes)}])[1]",
+        }
+        # Compiled XPath objects are compiled once per thread; pages are parsed on fetch worker threads.
+        self._local = threading.local()
+
+    def _compiled(self):
+        compiled = getattr(self._local, "compiled", None)
+        if compiled is None:
+            compiled = self._local.compiled = {name: etree.XPath(expr) for name, expr in self.expressions.items()}
+        return compiled
+
+    def parse(self, html):
+        xpath = self._compiled()
+        document = lxml.html.fromstring(html)
+        return [self._fields(container, xpath) for container in xpath["containers"](document)]
+
+    def _fields(self, container, xpath):
+        image = xpath["image"](container)
+        price = xpath["price"](container)
+        link = xpath["link"](container)
+        image = image[0] if image else None
+        return {
+            "image_url": (image.get("src") or image.get("data-src")) if image is not None else None,
+            "name": image.get("alt") if image is not None else None,
+            "price": price[0].text_content().strip() if price else None,
+            "href": link[0].get("href") if link else None,
+        }
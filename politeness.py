@@ -0,0 +1,175 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+THROTTLE_STATUSES = {429, 503}
+
+
+class HostPolicy:
+    """Limits for one host (or domain): concurrent requests, requests per second and burst size."""
+
+    def __init__(self, concurrency=2, rate=1.0, burst=None):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+
+
+# Defaults for the hosts the scrapers talk to; a policy applies to the domain and all its subdomains.
+HOST_POLICIES = {
+    "flipkart.com": HostPolicy(concurrency=3, rate=2.0, burst=3),
+    "flixcart.com": HostPolicy(concurrency=8, rate=10.0, burst=10),
+    "archive.ics.uci.edu": HostPolicy(concurrency=4, rate=4.0, burst=4),
+}
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostState:
+    """Concurrency slots and an adaptive token bucket for one host."""
+
+    def __init__(self, policy, min_rate):
+        self.policy = policy
+        self.slots = threading.BoundedSemaphore(policy.concurrency)
+        self.rate = policy.rate
+        self.min_rate = min(min_rate, policy.rate)
+        self.tokens = policy.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token and returns 0, or returns the seconds to wait before trying again."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.tokens = min(self.policy.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def throttled(self, delay):
+        with self.lock:
+            now = time.monotonic()
+            # Requests already in flight when the host pushed back count as one slowdown, not several.
+            if now >= self.paused_until:
+                self.rate = max(self.min_rate, self.rate / 2)
+            self.paused_until = max(self.paused_until, now + delay)
+            # Start from an empty bucket after the pause instead of a burst.
+            self.tokens = 0.0
+            self.updated = self.paused_until
+
+    def succeeded(self):
+        with self.lock:
+            # Additive recovery back towards the configured rate after a slowdown.
+            if self.rate < self.policy.rate:
+                self.rate = min(self.policy.rate, self.rate + self.policy.rate / 100)
+
+
+class PolitenessScheduler:
+    """Paces requests per host so parallel scrapers never hammer a site.
+
+    Each host gets at most `concurrency` requests in flight and a token
+    bucket of `rate` requests per second, from `policies` (matched on the
+    host or any parent domain) or the defaults. A 429 or 503 pauses the whole
+    host for its Retry-After (or an exponential backoff when there is none),
+    halves its rate, and retries the request up to `max_retries` times; the
+    rate then climbs back as requests succeed. One scheduler is meant to be
+    shared by every session of a process, see shared_scheduler().
+    """
+
+    def __init__(self, policies=None, default_policy=None, max_retries=3, backoff_base=2.0, backoff_cap=120.0,
+                 min_rate=0.1):
+        self.policies = dict(HOST_POLICIES if policies is None else policies)
+        self.default_policy = default_policy or HostPolicy()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.min_rate = min_rate
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _key(self, host):
+        """The policy domain covering host, or host itself."""
+        parts = host.split(".")
+        for i in range(len(parts)):
+            domain = ".".join(parts[i:])
+            if domain in self.policies:
+                return domain
+        return host
+
+    def _state(self, url):
+        host = urlsplit(url).hostname or ""
+        key = self._key(host)
+        with self._lock:
+            state = self._hosts.get(key)
+            if state is None:
+                state = self._hosts[key] = _HostState(self.policies.get(key, self.default_policy), self.min_rate)
+            return state
+
+    @contextmanager
+    def slot(self, url):
+        """Holds one of the host's concurrency slots, entered once its rate limit allows a request."""
+        state = self._state(url)
+        with state.slots:
+            while True:
+                wait = state.acquire()
+                if wait <= 0:
+                    break
+                time.sleep(wait)
+            yield state
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_cap)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def request(self, send, method, url, **kwargs):
+        """Calls send(method, url, **kwargs) under the host's limits, retrying throttled responses.
+
+        The last response is returned as is once retries run out, so callers
+        see the 429/503 like any other error status.
+        """
+        for attempt in range(self.max_retries + 1):
+            with self.slot(url) as state:
+                response = send(method, url, **kwargs)
+            if response.status_code not in THROTTLE_STATUSES:
+                state.succeeded()
+                return response
+            delay = self.backoff(attempt, parse_retry_after(response.headers.get("Retry-After")))
+            state.throttled(delay)
+            if attempt == self.max_retries:
+                break
+            print(f"{response.status_code} from {urlsplit(url).hostname}, pausing it for {delay:.1f}s")
+            response.close()
+        return response
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler():
+    """The process-wide scheduler used by make_session() unless another one is given."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PolitenessScheduler()
+        return _shared
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+
+class ResponseCache:
+    """Size-bounded on-disk cache of page responses, shared by the scrapers.
+
+    Bodies live as files under cache_dir, named by the SHA-1 of their key
+    (normally the URL); an SQLite index keeps validators, sizes and access
+    times. Entries younger than `ttl` seconds are served without touching
+    the network; older ones are revalidated with If-None-Match /
+    If-Modified-Since and a 304 just renews them. Once the bodies exceed
+    `max_bytes` the least recently used are evicted. With offline=True every
+    cached entry is served regardless of age and nothing is fetched, which
+    replays a previous run.
+    """
+
+    def __init__(self, cache_dir=".http_cache", ttl=3600, max_bytes=500 * 1024 * 1024, offline=False):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+        self._db.commit()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".html")
+
+    def lookup(self, key):
+        """Returns (text, entry) for a cached key, or (None, None)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fetched_at, etag, last_modified FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            self.delete(key)
+            return None, None
+        return text, {"fetched_at": row[0], "etag": row[1], "last_modified": row[2]}
+
+    def is_fresh(self, entry):
+        return self.offline or time.time() - entry["fetched_at"] < self.ttl
+
+    def store(self, key, text, etag=None, last_modified=None):
+        data = text.encode("utf-8")
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, size, fetched_at, accessed_at, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, len(data), now, now, etag, last_modified)
+            )
+            self._db.commit()
+        self.evict()
+
+    def touch(self, key, renewed=False):
+        now = time.time()
+        with self._lock:
+            if renewed:
+                self._db.execute("UPDATE entries SET accessed_at = ?, fetched_at = ? WHERE key = ?", (now, now, key))
+            else:
+                self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        """Drops least recently used entries until the cached bodies fit in max_bytes."""
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                if total <= self.max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in victims])
+            self._db.commit()
+        for key in victims:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get_text(self, session, url, timeout=15):
+        """Returns the body of url from the cache or the network.
+
+        Raises requests.RequestException like session.get when the page has
+        to be fetched and cannot be; in offline mode a miss raises too.
+        """
+        text, entry = self.lookup(url)
+        if entry is not None and self.is_fresh(entry):
+            self.hits += 1
+            self.touch(url)
+            return text
+        if self.offline:
+            raise requests.ConnectionError(f"Offline cache miss for {url}")
+
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = session.get(url, headers=headers or None, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            self.revalidated += 1
+            self.touch(url, renewed=True)
+            return text
+        response.raise_for_status()
+
+        self.misses += 1
+        self.store(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.text
+
+    def close(self):
+        with self._lock:
+            self._db.close()
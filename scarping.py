@@ -1,60 +1,82 @@
-import requests
-from bs4 import BeautifulSoup
 import openpyxl
 from openpyxl.drawing.image import Image
 import os
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 import smtplib
 import ssl
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
+from concurrent.futures import ThreadPoolExecutor
+from fetching import ImageDownloader, PageFetcher, chrome_options, make_chrome_driver
+from image_pack import ImagePack
+from image_transcode import ImageTranscoder
+import parsing
+from response_cache import ResponseCache
 
 class EcommerceScraper:
-    def __init__(self, product_names, image_dir='downloaded_images'):
+    def __init__(self, product_names, image_dir='downloaded_images', max_workers=3, cache=None, streaming=True):
         self.product_names = product_names
+        self.max_workers = max_workers
+        self.streaming = streaming
         self.base_url = "https://www.flipkart.com/search?q={}&otracker=search&otracker1=search&marketplace=FLIPKART&as-show=on&as=off"
         self.image_dir = image_dir
         self.headers = ["image", "name", "price", "product_link"]
+        self.product_class = "tUxRFH"
         self.sender_email = 'maxrai788@gmail.com'
         self.sender_password = 'rqcuswodywcazihj'
         self.recipients = ["maxrai788@gmail.com", "max.c@shikhartech.com"]
         self.create_excel_workbook()
-        self.setup_selenium()
+        self.fetcher = PageFetcher(self.setup_selenium, drivers=max_workers, cache=cache or ResponseCache(),
+                                   wait_selector=f"div.{self.product_class}")
+        self.image_downloader = ImageDownloader()
+        self.transcoder = ImageTranscoder()
+        self.image_pack = ImagePack(image_dir)
+        self.pending_images = []
 
     def create_excel_workbook(self):
         os.makedirs(self.image_dir, exist_ok=True)
-        self.wb = openpyxl.Workbook()
-        self.sheet = self.wb.active
+        # A write-only workbook streams rows to a temporary file instead of keeping every cell in memory.
+        self.wb = openpyxl.Workbook(write_only=self.streaming)
+        self.sheet = self.wb.create_sheet() if self.streaming else self.wb.active
         self.sheet.append(self.headers)
+        self.row_count = 1
 
     def setup_selenium(self):
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("start-maximized")
-        chrome_options.add_argument("disable-infobars")
-        chrome_options.add_argument("--disable-extensions")
-        self.driver = webdriver.Chrome(options=chrome_options)
+        options = chrome_options(
+            "--disable-blink-features=AutomationControlled",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "start-maximized",
+            "disable-infobars",
+            "--disable-extensions",
+        )
+        return make_chrome_driver(options)
 
     def scrape(self):
-        for product_name in self.product_names:
-            print(f"Scraping product name: {product_name}")
-            search_url = self.base_url.format(product_name.replace(" ", "%20"))
-            self.scrape_url(search_url)
-            print(f"Finished scraping for product: {product_name}\n")
-
+        search_urls = [self.base_url.format(name.replace(" ", "%20")) for name in self.product_names]
+        # Pages are fetched concurrently, but rows and images go into the sheet one product at a time, in order.
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pages = executor.map(self.fetch_product_containers, search_urls)
+            for product_name, search_url, product_containers in zip(self.product_names, search_urls, pages):
+                print(f"Scraping product name: {product_name}")
+                self.scrape_url(search_url, product_containers)
+                print(f"Finished scraping for product: {product_name}\n")
+
+        self.fetcher.close()
+        self.embed_downloaded_images()
+        self.image_downloader.close()
+        self.transcoder.close()
         self.save_to_excel()
+        self.image_pack.close()
+
+    def fetch_product_containers(self, url):
+        return self.fetcher.fetch(url, self.parse_product_containers)
 
-    def scrape_url(self, url):
-        self.driver.get(url)
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-        product_containers = self.get_product_containers(soup)
+    def scrape_url(self, url, product_containers=None):
+        if product_containers is None:
+            product_containers = self.fetch_product_containers(url)
         
         if product_containers:
             for container in product_containers:
@@ -62,16 +84,16 @@ class EcommerceScraper:
         else:
             print(f"No products found for URL: {url}")
 
-    def get_product_containers(self, soup):
-        return soup.find_all('div', class_="tUxRFH")
+    def parse_product_containers(self, html):
+        return parsing.parse_product_containers(html, self.product_class)
 
     def scrape_product(self, container):
         image_url, product_name = self.get_product_image(container)
         product_link = self.get_product_link(container)
         price = self.get_product_price(container)
 
-        self.download_image(image_url, product_name)
         self.add_to_sheet(product_name, price, product_link)
+        self.download_image(image_url, product_name, self.row_count)
 
     def get_product_image(self, container):
         img_tag = container.find('img')
@@ -87,30 +109,44 @@ class EcommerceScraper:
         price_tag = container.find('div', class_="Nx9bqj _4b5DiR")
         return price_tag.text if price_tag else 'Price not available'
 
-    def download_image(self, image_url, product_name):
+    def download_image(self, image_url, product_name, row):
+        """Queues the image download; its thumbnail is embedded into `row` by embed_downloaded_images."""
         if image_url:
-            image_response = requests.get(image_url)
-            if image_response.status_code == 200:
-                self.save_image(image_response.content, product_name)
-            else:
-                print(f"Failed to download image for {product_name}")
+            future = self.image_downloader.submit(
+                image_url,
+                lambda content: self.transcoder.transcode_packed(self.image_pack, self.save_image(content, product_name))
+            )
+            self.pending_images.append((row, product_name, future))
         else:
             print(f"No image URL available for {product_name}")
 
     def save_image(self, image_content, product_name):
-        image_filename = os.path.join(self.image_dir, f"{product_name}.jpg")
-        with open(image_filename, 'wb') as img_file:
-            img_file.write(image_content)
-        self.add_image_to_excel(image_filename)
-
-    def add_image_to_excel(self, image_filename):
-        img = Image(image_filename)
+        """Appends the image to the pack under its content hash and returns that key."""
+        return self.image_pack.put(image_content)
+
+    def embed_downloaded_images(self):
+        for row, product_name, future in self.pending_images:
+            # One bad image (download, pack or transcode error) must not cost the whole workbook.
+            try:
+                variants = future.result()
+                if variants:
+                    self.add_image_to_excel(self.image_pack.open(variants["thumbnail"]), row)
+                else:
+                    print(f"Failed to download image for {product_name}")
+            except Exception as e:
+                print(f"Failed to add image for {product_name}: {e}")
+        self.pending_images = []
+
+    def add_image_to_excel(self, image, row=None):
+        """Anchors an image (a path or a file-like object) at column A of `row`."""
+        img = Image(image)
         img.height = 60
         img.width = 60
-        self.sheet.add_image(img, f"A{self.sheet.max_row}")
+        self.sheet.add_image(img, f"A{row or self.row_count}")
 
     def add_to_sheet(self, product_name, price, product_link):
         self.sheet.append(['', product_name, price, product_link])
+        self.row_count += 1
 
     def connect_to_smtp_server(self):
         try:
@@ -154,7 +190,7 @@ class EcommerceScraper:
             return False
 
     def save_to_excel(self):
-        if self.sheet.max_row > 1:  
+        if self.row_count > 1:
             excel_file_path = f'D:/task/scrapping_{datetime.now().strftime("%Y%m%d%H%M%S")}.xlsx'
             self.wb.save(excel_file_path)
             print(f"Excel file saved at: {excel_file_path}")
@@ -1,17 +1,28 @@
 from supabase import create_client, Client
-import requests
-from bs4 import BeautifulSoup
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import re
 import random
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fetching import ImageDownloader, PageFetcher, make_chrome_driver
+from crawl_frontier import CrawlFrontier
+from dedup_index import DedupIndex
+from image_pack import ImagePack
+from image_store import ImageStore
+from image_transcode import ImageTranscoder
+from parsing import parse_html
+from response_cache import ResponseCache
+from snapshot_store import SnapshotStore
+from supabase_sync import ProductSink, StorageManifest
 
 class SupabaseHandler:
     def __init__(self, url: str, key: str):
         self.supabase: Client = create_client(url, key)
         self.storage_bucket = "productimages"
+        self.manifest = StorageManifest(self.supabase, self.storage_bucket)
 
     def insert_product(self, product_data: dict):
         """Insert product data into Supabase."""
@@ -21,19 +32,25 @@ class SupabaseHandler:
         except Exception as e:
             print("Supabase insert error:", e)
 
-    def upload_image(self, image_path: str, filename: str):
-        """Upload image to Supabase storage."""
+    def product_sink(self, on_conflict="name,brand", batch_size=200, on_written=None):
+        """Return a buffered sink that bulk-upserts products keyed on on_conflict."""
+        return ProductSink(self.supabase, batch_size=batch_size, on_conflict=on_conflict, on_written=on_written)
+
+    def upload_image(self, image_path: str, filename: str, content_type: str = "image/jpeg", data: bytes = None):
+        """Upload image to Supabase storage, from image_path or from `data` when given."""
         try:
-            files = self.supabase.storage.from_(self.storage_bucket).list()
-            if any(f["name"] == filename for f in files):
+            if filename in self.manifest:
                 return filename
 
-            with open(image_path, "rb") as f:
-                self.supabase.storage.from_(self.storage_bucket).upload(
-                    filename,
-                    f,
-                    {"content-type": "image/jpeg"}
-                )
+            if data is None:
+                with open(image_path, "rb") as f:
+                    data = f.read()
+            self.supabase.storage.from_(self.storage_bucket).upload(
+                filename,
+                data,
+                {"content-type": content_type}
+            )
+            self.manifest.add(filename)
             return filename
         except Exception as e:
             print("Image upload error:", e)
@@ -41,75 +58,148 @@ class SupabaseHandler:
 
 
 class ImageHandler:
-    def __init__(self, image_dir="scarp_images"):
+    def __init__(self, image_dir="scarp_images", downloader=None, transcoder=None):
         self.image_dir = image_dir
-        os.makedirs(self.image_dir, exist_ok=True)
+        self.downloader = downloader or ImageDownloader()
+        self.transcoder = transcoder or ImageTranscoder()
+        self.pack = ImagePack(self.image_dir)
+        self.store = ImageStore(self.image_dir, pack=self.pack)
+        self.image_hashes = {}
 
     def download_image(self, url, product_name, supabase: SupabaseHandler):
-        """Download image from URL and save it locally."""
+        """Download image from URL if it changed, store it by content hash and upload its WebP variant."""
         if not url:
             return None
 
-        try:
-            res = requests.get(url, timeout=10)
-            res.raise_for_status()
-        except:
+        filename = self.store.fetch(url, self.downloader)
+        if filename is None:
             return None
 
-        filename = self._save(res.content, product_name)
-        supabase.upload_image(os.path.join(self.image_dir, filename), filename)
-        return filename
+        variants = self.transcoder.transcode_packed(self.pack, filename)
+        if variants is None:
+            return None
+        webp_name = os.path.basename(variants["webp"])
+        self.image_hashes[webp_name] = variants["dhash"]
+        supabase.upload_image(None, webp_name, "image/webp", data=self.pack.get(variants["webp"]))
+        return webp_name
 
-    def _save(self, content, name):
-        """Save image content to a file and return the filename."""
-        safe = re.sub(r'[\\/*?:"<>|]', "", name)
-        filename = f"{safe}_{random.randint(1000,9999)}.jpg"
-        path = os.path.join(self.image_dir, filename)
-        with open(path, "wb") as f:
-            f.write(content)
-        return filename
+    def queue_image(self, url, product_name, supabase: SupabaseHandler):
+        """Download, save and upload the image in the background; returns a Future of the filename."""
+        if not url:
+            return None
+        return self.downloader.run(self.download_image, url, product_name, supabase)
+
+    def close(self):
+        """Wait for queued downloads to finish and persist the URL index."""
+        self.downloader.close()
+        self.transcoder.close()
+        self.store.save_index()
+        self.pack.close()
 
 class FlipkartScraper:
 
     BASE_URL = "https://www.flipkart.com/search?q={}"
 
-    def __init__(self, products, supabase_handler):
+    def __init__(self, products, supabase_handler, max_workers=3, max_pages=5, state_file="crawl_state.json",
+                 cache=None, snapshots=None, dedup=None):
         self.products = products
         self.supabase = supabase_handler
         self.image_handler = ImageHandler()
-        self.driver = self._setup_driver()
+        self.pending_products = []
+        self.frontier = CrawlFrontier(state_file, max_pages=max_pages)
+        self.max_workers = max_workers
+        self.fetcher = PageFetcher(self._setup_driver, drivers=max_workers, cache=cache or ResponseCache(),
+                                   wait_selector="a[href*='/p/']")
+        # rating and reviews_count are placeholders re-rolled on every scrape, so they alone never trigger a push.
+        self.snapshots = snapshots or SnapshotStore(price_field="amount", ignore_fields=("rating", "reviews_count"))
+        self.run_id = None
+        self.dedup = dedup or DedupIndex()
 
     def _setup_driver(self):
-        """Setup Selenium WebDriver in headless mode."""
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        return webdriver.Chrome(options=options)
+        """Setup Selenium WebDriver in headless mode, without images, fonts or media."""
+        return make_chrome_driver()
 
     def scrape_all(self):
-        """Scrape all products in the list."""
+        """Crawl up to max_pages result pages per product, several pages at a time.
+
+        Progress is kept in the crawl frontier's state file, so an interrupted
+        run resumes where it stopped when started again.
+        """
         for product in self.products:
-            print(f"\nScraping: {product}")
-            self.scrape_page(self.BASE_URL.format(product.replace(" ", "%20")))
+            self.frontier.seed(product, self.BASE_URL)
+        self.run_id = self.snapshots.start_run("flipkart")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                batch = self.frontier.take(self.max_workers)
+                if not batch:
+                    break
+                pages = executor.map(self._fetch_product_links, [entry["url"] for entry in batch])
+                new_counts = []
+                for entry, product_links in zip(batch, pages):
+                    print(f"\nScraping: {entry['term']} (page {entry['page']})")
+                    new_counts.append(self.scrape_page(entry["url"], product_links))
+                # Products are stored before their pages are marked done, so a resumed crawl never loses them.
+                self.insert_pending_products()
+                for entry, new_products in zip(batch, new_counts):
+                    # A page with nothing new means the results ran out (or repeat); stop paginating that term.
+                    self.frontier.complete(entry, found_products=new_products > 0)
+        self.fetcher.close()
+        self.image_handler.close()
+        self.snapshots.finish_run(self.run_id)
+        self.dedup.save()
+        self.frontier.finish()
+
+    def insert_pending_products(self):
+        """Snapshot the queued products once their images are available and upsert only the changed ones.
+
+        Near-duplicates of products already seen (other colour or storage
+        variants of the same model) are dropped first.
+        """
+        rows = []
+        for product_data, image_future in self.pending_products:
+            product_data["banner_url"] = image_future.result() if image_future else None
+            duplicate_of = self.dedup.check(
+                self.snapshots.key_for(product_data),
+                product_data["name"],
+                self.image_handler.image_hashes.get(product_data["banner_url"])
+            )
+            if duplicate_of:
+                print(f"Skipping near-duplicate: {product_data['name']} (matches {duplicate_of})")
+                continue
+            rows.append(product_data)
+        self.pending_products = []
 
-    def scrape_page(self, url):
-        """Scrape a single search results page."""
-        self.driver.get(url)
-        soup = BeautifulSoup(self.driver.page_source, "html.parser")
+        changed = self.snapshots.record_many(self.run_id, rows)
+        print(f"{len(changed)} of {len(rows)} products changed since the last scrape")
+        with self.supabase.product_sink(on_written=self.snapshots.mark_synced) as sink:
+            for product_data in changed:
+                sink.add(product_data)
 
-        product_links = soup.select("a[href*='/p/']")
+    def _fetch_product_links(self, url):
+        return self.fetcher.fetch(url, self._find_product_links)
 
-        seen = set()
+    def scrape_page(self, url, product_links=None):
+        """Scrape a single search results page; returns how many products were new to this crawl."""
+        if product_links is None:
+            product_links = self._fetch_product_links(url)
 
+        new_products = 0
         for link in product_links:
             href = link.get("href")
-            if not href or href in seen:
+            if not href or not self.frontier.add_product(href):
                 continue
-            seen.add(href)
+            new_products += 1
 
             container = link.parent
             self.scrape_product(container, link)
 
+        return new_products
+
+    def _find_product_links(self, html):
+        """Return the product links of a search results page."""
+        return parse_html(html).select("a[href*='/p/']")
+
     def scrape_product(self, container, link):
         """Scrape individual product details and insert into Supabase."""
         img = link.find("img")
@@ -127,11 +217,11 @@ class FlipkartScraper:
 
         price = self._clean_price(price_text)
 
-        image_filename = self.image_handler.download_image(
+        image_future = self.image_handler.queue_image(
             image_url, name, self.supabase
         )
 
-        self.supabase.insert_product({
+        self.pending_products.append(({
             "name": name,
             "amount": price,
             "type": "Watch",
@@ -140,8 +230,8 @@ class FlipkartScraper:
             "rating": round(random.uniform(3.5, 4.9), 1),
             "reviews_count": random.randint(50, 5000),
             "description": name,
-            "banner_url": image_filename
-        })
+            "banner_url": None
+        }, image_future))
 
     def _clean_price(self, text):
         """Extract numeric price from text."""
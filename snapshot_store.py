@@ -0,0 +1,204 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+
+class SnapshotStore:
+    """Local SQLite history of scrape runs, used to push only changed products upstream.
+
+    Every run gets a row in `runs`; every product seen in it gets an
+    observation (its price plus the full row as JSON). Products are
+    identified by `key_columns`. record_many() compares each row with the
+    product's last snapshot, stores the field-level differences in
+    `changes`, and returns only the rows that are new, changed, or not yet
+    confirmed by mark_synced(). A failed upload is therefore retried on the
+    next run instead of being lost. Fields in `ignore_fields` are recorded
+    but never count as a change. Price history is read from the
+    observations and needs no network.
+    """
+
+    def __init__(self, db_path="scrape_snapshots.sqlite3", key_columns=("name", "brand"), price_field="price",
+                 ignore_fields=()):
+        self.db_path = db_path
+        self.key_columns = tuple(key_columns)
+        self.price_field = price_field
+        self.ignore_fields = set(ignore_fields)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                source TEXT,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                products INTEGER NOT NULL DEFAULT 0,
+                changed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                data TEXT NOT NULL,
+                first_run INTEGER NOT NULL,
+                last_run INTEGER NOT NULL,
+                synced INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS observations (
+                run_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                price REAL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (product_id, run_id)
+            );
+            CREATE TABLE IF NOT EXISTS changes (
+                run_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                old_value TEXT,
+                new_value TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_observations_run ON observations (run_id);
+            CREATE INDEX IF NOT EXISTS idx_changes_product ON changes (product_id, run_id);
+            CREATE INDEX IF NOT EXISTS idx_changes_run ON changes (run_id);
+        """)
+        self._db.commit()
+
+    def key_for(self, product):
+        return json.dumps([product.get(column) for column in self.key_columns], ensure_ascii=False)
+
+    def start_run(self, source=None):
+        with self._lock:
+            cursor = self._db.execute("INSERT INTO runs (source, started_at) VALUES (?, ?)", (source, time.time()))
+            self._db.commit()
+            return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        with self._lock:
+            self._db.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), run_id))
+            self._db.commit()
+
+    def diff(self, old, new):
+        """Returns {field: (old_value, new_value)} for the fields of `new` that differ from `old`."""
+        return {
+            field: (old.get(field), value)
+            for field, value in new.items()
+            if field not in self.ignore_fields and old.get(field) != value
+        }
+
+    def record_many(self, run_id, rows):
+        """Snapshots rows under run_id and returns the ones that still have to be pushed upstream."""
+        pending = []
+        changed = 0
+        with self._lock, self._db:
+            for row in rows:
+                key = self.key_for(row)
+                data = json.dumps(row, ensure_ascii=False, default=str)
+                # Round-trip so stored and fresh values compare the same way (tuples, dates, ...).
+                row_values = json.loads(data)
+                existing = self._db.execute(
+                    "SELECT id, data, synced FROM products WHERE key = ?", (key,)
+                ).fetchone()
+
+                if existing is None:
+                    product_id = self._db.execute(
+                        "INSERT INTO products (key, data, first_run, last_run) VALUES (?, ?, ?, ?)",
+                        (key, data, run_id, run_id)
+                    ).lastrowid
+                    differences = {field: (None, value) for field, value in row_values.items()}
+                    synced = False
+                else:
+                    product_id, old_data, synced = existing
+                    differences = self.diff(json.loads(old_data), row_values)
+                    synced = synced and not differences
+                    self._db.execute(
+                        "UPDATE products SET data = ?, last_run = ?, synced = ? WHERE id = ?",
+                        (data, run_id, int(synced), product_id)
+                    )
+
+                self._db.execute(
+                    "INSERT OR REPLACE INTO observations (run_id, product_id, price, data) VALUES (?, ?, ?, ?)",
+                    (run_id, product_id, row.get(self.price_field), data)
+                )
+                self._db.executemany(
+                    "INSERT INTO changes (run_id, product_id, field, old_value, new_value) VALUES (?, ?, ?, ?, ?)",
+                    [(run_id, product_id, field, json.dumps(old, default=str), json.dumps(new, default=str))
+                     for field, (old, new) in differences.items()]
+                )
+                if differences:
+                    changed += 1
+                if not synced:
+                    pending.append(row)
+
+            self._db.execute(
+                "UPDATE runs SET products = products + ?, changed = changed + ? WHERE id = ?",
+                (len(rows), changed, run_id)
+            )
+        return pending
+
+    def mark_synced(self, rows):
+        """Records that rows were written upstream, so unchanged copies are skipped from now on."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE products SET synced = 1 WHERE key = ?", [(self.key_for(row),) for row in rows]
+            )
+
+    def price_history(self, *key):
+        """Returns [(run started_at, price)] for the product with key values `key`, oldest first."""
+        with self._lock:
+            return self._db.execute("""
+                SELECT runs.started_at, observations.price
+                FROM products
+                JOIN observations ON observations.product_id = products.id
+                JOIN runs ON runs.id = observations.run_id
+                WHERE products.key = ?
+                ORDER BY observations.run_id
+            """, (json.dumps(list(key), ensure_ascii=False),)).fetchall()
+
+    def changes(self, run_id):
+        """Returns [(product key, field, old value, new value)] recorded in run_id."""
+        with self._lock:
+            rows = self._db.execute("""
+                SELECT products.key, changes.field, changes.old_value, changes.new_value
+                FROM changes JOIN products ON products.id = changes.product_id
+                WHERE changes.run_id = ?
+                ORDER BY products.key, changes.field
+            """, (run_id,)).fetchall()
+        return [(key, field, json.loads(old), json.loads(new)) for key, field, old, new in rows]
+
+    def runs(self, limit=20):
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, source, started_at, finished_at, products, changed FROM runs ORDER BY id DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the local scrape snapshot store.")
+    parser.add_argument("--db", default="scrape_snapshots.sqlite3")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs", help="list recent scrape runs")
+    history = commands.add_parser("history", help="price history of one product")
+    history.add_argument("key", nargs="+", help="key column values, e.g. name and brand")
+    changes = commands.add_parser("changes", help="field changes recorded in a run")
+    changes.add_argument("run_id", type=int)
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.db)
+    if args.command == "runs":
+        for run_id, source, started_at, finished_at, products, changed in store.runs():
+            started = time.strftime("%Y-%m-%d %H:%M", time.localtime(started_at))
+            status = "finished" if finished_at else "unfinished"
+            print(f"#{run_id} {started} {source or ''} {products} products, {changed} changed ({status})")
+    elif args.command == "history":
+        for started_at, price in store.price_history(*args.key):
+            print(time.strftime("%Y-%m-%d %H:%M", time.localtime(started_at)), price)
+    else:
+        for key, field, old, new in store.changes(args.run_id):
+            print(f"{key} {field}: {old} -> {new}")
+    store.close()
@@ -0,0 +1,145 @@
+import atexit
+import threading
+import time
+
+
+class StorageManifest:
+    """Local index of the object names in a Supabase storage bucket.
+
+    The bucket is listed once, page by page, and kept in a set so existence
+    checks are O(1) instead of a full listing per upload. Uploads made through
+    this process are added with add(); the whole listing is re-synced every
+    `resync_interval` seconds to pick up objects written by anyone else.
+    """
+
+    def __init__(self, supabase, bucket, page_size=1000, resync_interval=3600):
+        self.supabase = supabase
+        self.bucket = bucket
+        self.page_size = page_size
+        self.resync_interval = resync_interval
+        self.names = set()
+        self.synced_at = None
+        self._added = set()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def __contains__(self, name):
+        self._ensure_fresh()
+        with self._lock:
+            return name in self.names
+
+    def __len__(self):
+        self._ensure_fresh()
+        return len(self.names)
+
+    def add(self, name):
+        with self._lock:
+            self.names.add(name)
+            self._added.add(name)
+
+    def discard(self, name):
+        with self._lock:
+            self.names.discard(name)
+
+    def sync(self):
+        """Re-lists the whole bucket and replaces the local index."""
+        with self._lock:
+            self._added = set()
+        names = set()
+        offset = 0
+        while True:
+            page = self.supabase.storage.from_(self.bucket).list(
+                options={"limit": self.page_size, "offset": offset}
+            )
+            names.update(f["name"] for f in page)
+            if len(page) < self.page_size:
+                break
+            offset += self.page_size
+        with self._lock:
+            # Keep names uploaded while the listing was in progress.
+            self.names = names | self._added
+            self.synced_at = time.monotonic()
+
+    def _is_stale(self):
+        return self.synced_at is None or time.monotonic() - self.synced_at >= self.resync_interval
+
+    def _ensure_fresh(self):
+        if self._is_stale():
+            # Only one thread lists the bucket; the others wait and reuse its result.
+            with self._sync_lock:
+                if self._is_stale():
+                    self.sync()
+
+
+class ProductSink:
+    """Buffers product rows and writes them to Supabase with bulk upserts.
+
+    Rows are sent `batch_size` at a time as one upsert on the `on_conflict`
+    columns (comma separated, backed by a unique constraint on the table), so
+    re-scraped products update their existing row instead of being inserted
+    again. Rows missing a key column cannot conflict and are inserted as they
+    are. Whatever is still buffered is flushed on close() or at interpreter
+    exit. `on_written`, if given, is called with each batch that was written
+    successfully.
+    """
+
+    def __init__(self, supabase, table="products", batch_size=200, on_conflict="product_link", on_written=None):
+        self.supabase = supabase
+        self.table = table
+        self.batch_size = batch_size
+        self.on_conflict = on_conflict
+        self.key_columns = [column.strip() for column in on_conflict.split(",")]
+        self.on_written = on_written
+        self.buffer = []
+        self.written = 0
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def add(self, product_data):
+        with self._lock:
+            self.buffer.append(product_data)
+            if len(self.buffer) < self.batch_size:
+                return
+            rows, self.buffer = self.buffer, []
+        self._write(rows)
+
+    def flush(self):
+        with self._lock:
+            rows, self.buffer = self.buffer, []
+        if rows:
+            self._write(rows)
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, rows):
+        keyed = {}
+        unkeyed = []
+        for row in rows:
+            key = tuple(row.get(column) for column in self.key_columns)
+            if None in key:
+                unkeyed.append(row)
+            else:
+                # Postgres rejects an upsert that touches the same row twice; the last scrape wins.
+                keyed[key] = row
+
+        table = self.supabase.table(self.table)
+        try:
+            if keyed:
+                table.upsert(list(keyed.values()), on_conflict=self.on_conflict).execute()
+            if unkeyed:
+                table.insert(unkeyed).execute()
+            self.written += len(keyed) + len(unkeyed)
+            print(f"Upserted {len(keyed) + len(unkeyed)} products into Supabase")
+        except Exception as e:
+            print(f"Failed to upsert {len(rows)} products into Supabase:", e)
+            return
+        if self.on_written:
+            self.on_written(rows)
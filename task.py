@@ -1,9 +1,41 @@
 import requests
-from bs4 import BeautifulSoup
 import csv
-from datetime import datetime, timedelta
-
-def scrape_uci_datasets():
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from parsing import parse_html
+from fetching import make_session
+from response_cache import ResponseCache
+
+
+def load_scraped_names(csv_file_path):
+    """Returns the dataset names already saved in csv_file_path (empty if it does not exist yet)."""
+    try:
+        with open(csv_file_path, newline='', encoding='utf-8') as file:
+            return {row[0] for row in csv.reader(file) if row}
+    except OSError:
+        return set()
+
+
+def load_scraped_urls(urls_path):
+    """Returns the dataset page URLs recorded in urls_path, one per line (empty if it does not exist yet)."""
+    try:
+        with open(urls_path, encoding='utf-8') as file:
+            return {line.strip() for line in file if line.strip()}
+    except OSError:
+        return set()
+
+
+def scrape_uci_datasets(cache=None, csv_file_path='uci_datasets.csv', max_workers=4):
+    """Scrapes the UCI dataset listings into csv_file_path, fetching only datasets not saved there yet.
+
+    Detail pages are fetched up to max_workers at a time over one shared
+    session, and each row is appended to the CSV (and flushed) as soon as its
+    page is parsed, so an interrupted run keeps everything it finished.
+    Datasets are identified by their page URL, kept one per line in
+    csv_file_path + '.urls' next to the CSV.
+    """
+    session = make_session(pool_size=max_workers)
+    cache = cache or ResponseCache()
     base_url = "https://archive.ics.uci.edu/datasets"
 
     # CSV headers
@@ -13,11 +45,24 @@ def scrape_uci_datasets():
         "Feature Type", "Instances", "Features"
     ]
 
-    data = []
+    urls_path = csv_file_path + '.urls'
+    scraped = load_scraped_urls(urls_path)
+    # Rows saved before URLs were recorded can only be matched by name; their URLs are recorded on this run.
+    legacy_names = set()
+    if not os.path.exists(urls_path):
+        legacy_names = load_scraped_names(csv_file_path) - {headers[0], "N/A"}
+
+    def fetch_page(url):
+        try:
+            return parse_html(cache.get_text(session, url))
+        except requests.RequestException as e:
+            print(f"Failed to fetch {url}:", e)
+            return None
 
     def scrape_dataset_details(dataset_url):
-        response = requests.get(dataset_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = fetch_page(dataset_url)
+        if soup is None:
+            return None
 
         dataset_name = soup.find('h1', class_='text-3xl font-semibold text-primary-content')
         dataset_name = dataset_name.text.strip() if dataset_name else "N/A"
@@ -42,21 +87,19 @@ def scrape_uci_datasets():
             subject_area, associated_tasks, feature_type, instances, features
         ]
         
-    def scrape_datasets(page_url):
-        response = requests.get(page_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
+    def find_datasets(page_url):
+        """Returns (name, detail page URL) for every dataset listed on page_url."""
+        soup = fetch_page(page_url)
+        if soup is None:
+            return []
 
         dataset_list = soup.find_all('a', class_='link-hover link text-xl font-semibold')
 
         if not dataset_list:
             print("No dataset links found")
-            return
+            return []
 
-        for dataset in dataset_list:
-            dataset_link = "https://archive.ics.uci.edu" + dataset['href']
-            print(f"Scraping details for {dataset.text.strip()}...")
-            dataset_details = scrape_dataset_details(dataset_link)
-            data.append(dataset_details)
+        return [(dataset.text.strip(), "https://archive.ics.uci.edu" + dataset['href']) for dataset in dataset_list]
 
     page_urls = [
 
@@ -65,17 +108,49 @@ def scrape_uci_datasets():
         "https://archive.ics.uci.edu/datasets?skip=20&take=30&sort=desc&orderBy=NumHits&search="
     ]
 
-    for page_url in page_urls:
-        print(f"Scraping page: {page_url}")
-        scrape_datasets(page_url)
-    
-    csv_file_path = f'D:/task/scrapping_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
-    with open( csv_file_path, 'w', newline='', encoding='utf-8') as file:
+    new_file = not os.path.exists(csv_file_path) or os.path.getsize(csv_file_path) == 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            open(csv_file_path, 'a', newline='', encoding='utf-8') as file, \
+            open(urls_path, 'a', encoding='utf-8') as urls_file:
         writer = csv.writer(file)
-        writer.writerow(headers)
-        writer.writerows(data)
-
-    print("Data scraping and saving to CSV complete!")
-
-
-scrape_uci_datasets()
+        if new_file:
+            writer.writerow(headers)
+
+        def mark_scraped(dataset_link):
+            scraped.add(dataset_link)
+            urls_file.write(dataset_link + '\n')
+            urls_file.flush()
+
+        pending, queued = {}, set()
+        for page_url, datasets in zip(page_urls, executor.map(find_datasets, page_urls)):
+            print(f"Scraped page: {page_url}")
+            for name, dataset_link in datasets:
+                # The listing pages overlap, and datasets saved by an earlier run are not fetched again.
+                if dataset_link in scraped or dataset_link in queued:
+                    continue
+                if name in legacy_names:
+                    mark_scraped(dataset_link)
+                    continue
+                queued.add(dataset_link)
+                print(f"Scraping details for {name}...")
+                pending[executor.submit(scrape_dataset_details, dataset_link)] = (name, dataset_link)
+
+        added = 0
+        for future in as_completed(pending):
+            name, dataset_link = pending[future]
+            dataset_details = future.result()
+            if not dataset_details:
+                continue
+            if dataset_details[0] == "N/A":
+                # No title on the detail page; the listing's link text still names it.
+                dataset_details[0] = name
+            writer.writerow(dataset_details)
+            file.flush()
+            mark_scraped(dataset_link)
+            added += 1
+
+    print(f"Data scraping complete: {added} new datasets appended to {csv_file_path}")
+
+
+if __name__ == "__main__":
+    scrape_uci_datasets()
@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from image_pack import RECORD_HEADER, ImagePack
+
+
+def image(n, size=100):
+    return f"image-{n}-".encode() * size
+
+
+def put_images(directory, writer, count):
+    with ImagePack(directory) as pack:
+        for n in range(count):
+            pack.put(image(f"{writer}/{n}", 20 + n), f"{writer}/{n}")
+
+
+class ImagePackTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reopen_keeps_every_image(self):
+        with ImagePack(self.directory) as pack:
+            keys = [pack.put(image(n)) for n in range(10)]
+            pack.put(b"replaced", keys[0], replace=True)
+        with ImagePack(self.directory) as pack:
+            self.assertEqual(len(pack), 10)
+            self.assertEqual(pack.get(keys[0]), b"replaced")
+            for n, key in enumerate(keys[1:], 1):
+                self.assertEqual(pack.get(key), image(n))
+
+    def test_torn_trailing_record_is_cut_on_open(self):
+        with ImagePack(self.directory) as pack:
+            key = pack.put(image(1))
+            index_size = os.path.getsize(pack.index_path)
+            index_path = pack.index_path
+        # A writer that died halfway through its index record, and one whose blob never made it to disk.
+        with open(index_path, "ab") as f:
+            f.write(RECORD_HEADER.pack(0, 10, 5)[:7])
+        with ImagePack(self.directory) as pack:
+            self.assertEqual(os.path.getsize(index_path), index_size)
+            self.assertEqual(pack.keys(), [key])
+        with open(index_path, "ab") as f:
+            f.write(RECORD_HEADER.pack(10 ** 9, 10, 4) + b"lost")
+        with ImagePack(self.directory) as pack:
+            self.assertEqual(os.path.getsize(index_path), index_size)
+            self.assertNotIn("lost", pack)
+            new_key = pack.put(image(2))
+        with ImagePack(self.directory) as pack:
+            self.assertEqual(pack.get(key), image(1))
+            self.assertEqual(pack.get(new_key), image(2))
+
+    def test_key_from_another_writer_is_visible_after_a_miss(self):
+        with ImagePack(self.directory) as reader, ImagePack(self.directory) as writer:
+            reader.put(image("reader"), "reader")
+            key = writer.put(image("writer"))
+            self.assertEqual(reader.get(key), image("writer"))
+            self.assertIn(key, reader)
+            # The writer's next record must not overwrite the reader's bytes, and vice versa.
+            self.assertEqual(writer.get("reader"), image("reader"))
+
+    def test_concurrent_processes_share_one_pack(self):
+        context = multiprocessing.get_context("spawn")
+        with ImagePack(self.directory) as reader:
+            writers = [context.Process(target=put_images, args=(self.directory, w, 50)) for w in range(3)]
+            for process in writers:
+                process.start()
+            for process in writers:
+                process.join()
+            self.assertEqual([process.exitcode for process in writers], [0, 0, 0])
+            for w in range(3):
+                for n in range(50):
+                    self.assertEqual(reader.get(f"{w}/{n}"), image(f"{w}/{n}", 20 + n))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import asyncio
+import io
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from voxships import (AsyncVoxShipsClient, Bulkhead, BulkheadFullError, CircuitBreaker, CircuitOpenError,
+                      VoxShipsClient, aiohttp, order_not_taken)
+
+
+def make_response(status=200, payload=None, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO()
+    response._content = json.dumps(payload or {'returnType': 'success', 'result': {'orderId': 'VOX-1'}}).encode()
+    return response
+
+
+class StubSession:
+    """Stands in for the client's requests.Session, answering every post with the next queued result."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def post(self, *args, **kwargs):
+        self.calls += 1
+        result = self.results.pop(0) if self.results else make_response()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def close(self):
+        pass
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def open_client(self, reset_timeout=0.05):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=reset_timeout)
+        client = VoxShipsClient('http://voxships.test', max_retries=0, breaker=breaker,
+                                bulkhead=Bulkhead(max_concurrent=1, max_wait=0.01))
+        client.session = StubSession(requests.ConnectionError('refused'))
+        with self.assertRaises(requests.ConnectionError):
+            client.create_order({}, 'token')
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        return client
+
+    def test_probe_rejected_by_bulkhead_is_handed_back(self):
+        client = self.open_client()
+        time.sleep(0.06)
+        # A slow call from before the breaker opened still holds the only slot.
+        client.bulkhead._slots.acquire()
+        with self.assertRaises(BulkheadFullError):
+            client.create_order({}, 'token')
+        client.bulkhead._slots.release()
+
+        self.assertEqual(client.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(client.create_order({}, 'token')['returnType'], 'success')
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_stale_half_open_probe_reopens(self):
+        client = self.open_client()
+        time.sleep(0.06)
+        client.breaker.before_call()  # a probe that never reports back
+        with self.assertRaises(CircuitOpenError):
+            client.create_order({}, 'token')
+
+        time.sleep(0.06)
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.06)
+        self.assertEqual(client.create_order({}, 'token')['returnType'], 'success')
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+
+class RetryTest(unittest.TestCase):
+    def test_long_retry_after_gives_up_instead_of_waiting(self):
+        client = VoxShipsClient('http://voxships.test', backoff_cap=1.0)
+        client.session = StubSession(make_response(429, headers={'Retry-After': '600'}))
+        start = time.monotonic()
+        with self.assertRaises(requests.HTTPError) as raised:
+            client.create_order({}, 'token')
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(client.session.calls, 1)
+        self.assertTrue(order_not_taken(raised.exception))
+
+    def test_every_throttled_attempt_counts_toward_the_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=3)
+        client = VoxShipsClient('http://voxships.test', max_retries=5, backoff_base=0.001, breaker=breaker)
+        client.session = StubSession(*[make_response(503) for _ in range(6)])
+        with self.assertRaises(requests.HTTPError):
+            client.create_order({}, 'token')
+        self.assertEqual(client.session.calls, 3)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+class FailingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.calls += 1
+        self.send_response(500)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class AsyncClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FailingHandler)
+        self.server.calls = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_breaker_stops_async_batch_hitting_a_failing_api(self):
+        breaker = CircuitBreaker(failure_threshold=3)
+
+        async def submit():
+            async with AsyncVoxShipsClient(self.url, breaker=breaker) as client:
+                return await client.create_orders([({}, 'token')] * 20, concurrency=1)
+
+        results = asyncio.run(submit())
+        self.assertEqual(self.server.calls, 3)
+        self.assertEqual(sum(isinstance(r, CircuitOpenError) for r in results), 17)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,408 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+if aiohttp is not None:
+    # Raised before the request is sent; ConnectionTimeoutError only exists from aiohttp 3.10.
+    CONNECT_ERRORS = (
+        aiohttp.ClientConnectorError,
+        getattr(aiohttp, 'ConnectionTimeoutError', aiohttp.ClientConnectorError),
+    )
+else:
+    CONNECT_ERRORS = ()
+
+# Everything either client raises for a request that failed in transit or got an error status.
+TRANSPORT_ERRORS = (requests.RequestException, asyncio.TimeoutError) + ((aiohttp.ClientError,) if aiohttp else ())
+
+
+# createOrder is not idempotent: only responses saying the order was not taken are retried.
+RETRY_STATUSES = {429, 503}
+# Statuses that count as an API failure for the circuit breaker.
+FAILURE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SubmissionRejected(Exception):
+    """The order was not sent; it should stay pending and be retried later."""
+
+
+class CircuitOpenError(SubmissionRejected):
+    pass
+
+
+class BulkheadFullError(SubmissionRejected):
+    pass
+
+
+class CircuitBreaker:
+    """Stops calling the API after repeated failures.
+
+    After failure_threshold consecutive failures the breaker opens and every
+    call is rejected immediately for reset_timeout seconds. It then goes
+    half-open and lets up to half_open_probes calls through: one success
+    closes it again, one failure re-opens it. A probe that never reaches the
+    API must be handed back with release_probe(), and probes still without
+    an outcome after reset_timeout re-open the breaker rather than keep it
+    half-open for good.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, half_open_probes=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+        self.probe_started_at = None
+        self._state = self.CLOSED
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        now = time.monotonic()
+        if self._state == self.HALF_OPEN and self.probes >= self.half_open_probes \
+                and now - self.probe_started_at >= self.reset_timeout:
+            # The probes never reported back; start over from open.
+            self._state = self.OPEN
+            self.opened_at = now
+        if self._state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self.probes = 0
+        return self._state
+
+    def before_call(self):
+        with self._lock:
+            state = self._current_state()
+            if state == self.OPEN:
+                raise CircuitOpenError('VoxShips API circuit is open')
+            if state == self.HALF_OPEN:
+                if self.probes >= self.half_open_probes:
+                    raise CircuitOpenError('VoxShips API circuit is half-open, probe in flight')
+                self.probes += 1
+                self.probe_started_at = time.monotonic()
+
+    def release_probe(self):
+        """Gives back the probe slot of a half-open call that never reached the API."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class Bulkhead:
+    """Caps concurrent API calls; callers wait at most max_wait seconds for a slot."""
+
+    def __init__(self, max_concurrent=20, max_wait=1.0):
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def __enter__(self):
+        if not self._slots.acquire(timeout=self.max_wait):
+            raise BulkheadFullError('Too many VoxShips API calls in flight')
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+
+
+class AsyncBulkhead:
+    """asyncio counterpart of Bulkhead: caps concurrent calls on one event loop."""
+
+    def __init__(self, max_concurrent=100, max_wait=1.0):
+        self.max_wait = max_wait
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    async def __aenter__(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            raise BulkheadFullError('Too many VoxShips API calls in flight') from None
+        return self
+
+    async def __aexit__(self, *exc):
+        self._slots.release()
+
+
+def backoff_delay(attempt, base, cap, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than a server supplied Retry-After, never longer than cap."""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+def can_wait(retry_after, cap):
+    """False when the server asks for a longer pause than cap; the caller gives up and the order is re-queued."""
+    return retry_after is None or retry_after <= cap
+
+
+def parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_connect_error(exc):
+    """True when a requests exception happened before the request was sent (connect timeout, refused, DNS).
+
+    Errors after that point (read timeouts, resets mid-response) may come
+    after the API already created the order, so they must not be retried.
+    """
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = exc.args[0] if exc.args else None
+    reason = getattr(reason, 'reason', reason)
+    # NewConnectionError (refused, unreachable) and NameResolutionError both derive from ConnectTimeoutError.
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def order_not_taken(exc):
+    """True when an exception from create_order means the API cannot have created the order.
+
+    That is a call the client refused to make, an error connecting to the
+    API, or a RETRY_STATUSES answer. Anything else (read timeouts, 5xx after
+    the body was sent) leaves the outcome unknown.
+    """
+    if isinstance(exc, SubmissionRejected):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code in RETRY_STATUSES
+    if isinstance(exc, requests.RequestException):
+        return is_connect_error(exc)
+    if aiohttp is not None and isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status in RETRY_STATUSES
+    return isinstance(exc, CONNECT_ERRORS)
+
+
+def encode_payload(payload):
+    # orderDate comes straight from MySQL as a datetime, which the json module cannot encode.
+    return json.dumps(payload, default=str).encode()
+
+
+class VoxShipsClient:
+    """Keep-alive client for the VoxShips order API.
+
+    One pooled requests.Session is shared by every call (and every thread), so
+    TCP/TLS setup is paid once per connection instead of once per order.
+    Responses with a status in RETRY_STATUSES and errors connecting to the API
+    are retried with jittered exponential backoff; nothing is retried once
+    the request may have reached the API. create_order additionally runs
+    behind a CircuitBreaker and a Bulkhead and raises SubmissionRejected
+    instead of blocking when the API is failing or saturated, and
+    requests.HTTPError when it still answers with a FAILURE_STATUSES status.
+    """
+
+    def __init__(self, api_url, timeout=(3.05, 30), max_retries=3, backoff_base=0.5,
+                 backoff_cap=8.0, pool_size=20, verify=False, breaker=None, bulkhead=None):
+        self.api_url = api_url.rstrip('/')
+        self.breaker = breaker or CircuitBreaker()
+        self.bulkhead = bulkhead or Bulkhead(max_concurrent=pool_size)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.session = requests.Session()
+        self.session.verify = verify
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def create_order(self, payload, api_token):
+        self.breaker.before_call()
+        try:
+            with self.bulkhead:
+                response = self.send('/orders/createOrder', payload, api_token, breaker=self.breaker)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Bulkhead full or the payload could not be sent: no outcome to report.
+            self.breaker.release_probe()
+            raise
+
+        if response.status_code in FAILURE_STATUSES:
+            # send() already counted it against the breaker.
+            response.raise_for_status()
+        self.breaker.record_success()
+        return response.json()
+
+    def post(self, path, payload, api_token):
+        return self.send(path, payload, api_token).json()
+
+    def send(self, path, payload, api_token, breaker=None):
+        """POSTs payload, retrying as described on the class, and returns the last response.
+
+        A Retry-After longer than backoff_cap is not waited for (the thread
+        would sit on its bulkhead slot, and a worker on its row locks); the
+        429/503 is returned instead. With a breaker, every FAILURE_STATUSES
+        answer is recorded on it and retries stop once it opens.
+        """
+        body = encode_payload(payload)
+        headers = {'apiToken': api_token, 'Content-Type': 'application/json'}
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(f'{self.api_url}{path}', data=body, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt >= self.max_retries or not is_connect_error(e):
+                    raise
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+                attempt += 1
+                continue
+
+            if breaker is not None and response.status_code in FAILURE_STATUSES:
+                breaker.record_failure()
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if can_wait(retry_after, self.backoff_cap) and (breaker is None or breaker.state != CircuitBreaker.OPEN):
+                    response.close()
+                    time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap, retry_after))
+                    attempt += 1
+                    continue
+
+            return response
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncVoxShipsClient:
+    """asyncio counterpart of VoxShipsClient for submitting large batches.
+
+    Must be used as an async context manager so the aiohttp session and its
+    connection pool are opened and closed on the running loop. Retries follow
+    VoxShipsClient: RETRY_STATUSES and connect errors only. create_order runs
+    behind a CircuitBreaker (pass the sync client's to share its state) and
+    an AsyncBulkhead, and raises SubmissionRejected like VoxShipsClient.
+    """
+
+    def __init__(self, api_url, timeout=30, connect_timeout=3.05, max_retries=3, backoff_base=0.5,
+                 backoff_cap=8.0, pool_size=100, verify=False, breaker=None, bulkhead=None):
+        if aiohttp is None:
+            raise RuntimeError("AsyncVoxShipsClient requires the 'aiohttp' package")
+        self.api_url = api_url.rstrip('/')
+        self.breaker = breaker or CircuitBreaker()
+        self.bulkhead = bulkhead or AsyncBulkhead(max_concurrent=pool_size)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.pool_size = pool_size
+        self.verify = verify
+        self.session = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size, ssl=None if self.verify else False),
+            timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        self.session = None
+
+    async def create_order(self, payload, api_token):
+        self.breaker.before_call()
+        try:
+            async with self.bulkhead:
+                response_data = await self.post('/orders/createOrder', payload, api_token, breaker=self.breaker)
+        except aiohttp.ClientResponseError:
+            # post() already counted it against the breaker.
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.breaker.record_failure()
+            raise
+        except ValueError:
+            # The API answered, just not with JSON.
+            self.breaker.record_success()
+            raise
+        except BaseException:
+            # Bulkhead full or cancelled before an answer: no outcome to report.
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        return response_data
+
+    async def create_orders(self, submissions, concurrency=50):
+        """Submits (payload, api_token) pairs with at most `concurrency` requests in flight.
+
+        Results come back in input order; a failed submission yields its exception.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def submit(payload, api_token):
+            async with semaphore:
+                return await self.create_order(payload, api_token)
+
+        return await asyncio.gather(
+            *(submit(payload, api_token) for payload, api_token in submissions),
+            return_exceptions=True
+        )
+
+    async def post(self, path, payload, api_token, breaker=None):
+        """Returns the decoded JSON answer; raises aiohttp.ClientResponseError for FAILURE_STATUSES.
+
+        With a breaker, every FAILURE_STATUSES answer is recorded on it and
+        retries stop once it opens, as in VoxShipsClient.send.
+        """
+        body = encode_payload(payload)
+        headers = {'apiToken': api_token, 'Content-Type': 'application/json'}
+        attempt = 0
+        while True:
+            try:
+                async with self.session.post(f'{self.api_url}{path}', data=body, headers=headers) as response:
+                    if breaker is not None and response.status in FAILURE_STATUSES:
+                        breaker.record_failure()
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    retry = response.status in RETRY_STATUSES and attempt < self.max_retries \
+                        and can_wait(retry_after, self.backoff_cap) \
+                        and (breaker is None or breaker.state != CircuitBreaker.OPEN)
+                    if not retry:
+                        if response.status in FAILURE_STATUSES:
+                            response.raise_for_status()
+                        return await response.json(content_type=None)
+            except CONNECT_ERRORS:
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = None
+
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap, retry_after))
+            attempt += 1